@@ -33,6 +33,9 @@ PY33 = (sys.version_info >= (3, 3))
 # Python 3.4 or newer
 PY34 = (sys.version_info >= (3, 4))
 
+# Python 3.7 or newer
+PY37 = (sys.version_info >= (3, 7))
+
 text_type = str if PY3 else unicode
 
 class ClewnError(Exception):
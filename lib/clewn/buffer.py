@@ -11,10 +11,13 @@ from __future__ import unicode_literals
 
 import os
 import re
+from collections import OrderedDict
 
 from . import text_type, misc
 
 FRAME_ANNO_ID = 'frame'
+# Maximum number of buffers killed by Vim whose state is kept in BufferSet.
+MAX_KILLED_BUFFERS = 50
 
 RE_CLEWNAME = r'^\s*(?P<path>.*)\(clewn\)_\w+$'     \
               r'# RE: a valid ClewnBuffer name'
@@ -86,7 +89,7 @@ class Buffer(dict):
             self.nbsock.send_cmd(self, 'defineAnnoType',
                 '0 "0" "" "=>" none %s' % self.nbsock.bg_colors[2])
 
-    def add_anno(self, anno_id, lnum):
+    def add_anno(self, anno_id, lnum, disabled=False):
         """Add an annotation."""
         if anno_id not in self.keys():
             if anno_id == FRAME_ANNO_ID:
@@ -97,7 +100,23 @@ class Buffer(dict):
                 self[anno_id] = Annotation(self, anno_id, lnum, self.nbsock)
         else:
             self[anno_id].lnum = lnum
-        self.update(anno_id)
+        self.update(anno_id, disabled)
+
+    def move_anno(self, anno_id, lnum, disabled=False):
+        """Move an annotation to 'lnum' without moving the cursor.
+
+        Nothing is sent to Vim when the annotation is already placed at 'lnum'
+        with the same state.
+
+        """
+        anno = self[anno_id]
+        if anno.is_set and anno.lnum == lnum and anno.disabled == disabled:
+            return
+        anno.remove_anno()
+        anno.lnum = lnum
+        anno.disabled = disabled
+        if self.registered:
+            anno.place()
 
     def delete_anno(self, anno_id):
         """Delete an annotation."""
@@ -195,21 +214,29 @@ class Annotation(object):
             self.remove_anno()
             self.disabled = disabled
         if not self.is_set:
-            self.define_bpanno()
-            if self.disabled:
-                self.sernum = self.disabled_sernum
-                typeNum = self.disabled_typeNum
-            else:
-                self.sernum = self.enabled_sernum
-                typeNum = self.enabled_typeNum
-            self.nbsock.send_cmd(self.buf, 'addAnno', '%d %d %d/0 -1'
-                                    % (self.sernum, typeNum, self.lnum))
-            self.nbsock.last_buf = self.buf
-            self.nbsock.last_buf.lnum = self.lnum
-            self.nbsock.last_buf.col = 0
+            self.place()
+            self.setdot()
 
-            self.nbsock.send_cmd(self.buf, 'setDot', '%d/0' % self.lnum)
-            self.is_set = True
+    def place(self):
+        """Place the sign of the annotation."""
+        self.define_bpanno()
+        if self.disabled:
+            self.sernum = self.disabled_sernum
+            typeNum = self.disabled_typeNum
+        else:
+            self.sernum = self.enabled_sernum
+            typeNum = self.enabled_typeNum
+        self.nbsock.send_cmd(self.buf, 'addAnno', '%d %d %d/0 -1'
+                                % (self.sernum, typeNum, self.lnum))
+        self.is_set = True
+
+    def setdot(self):
+        """Set the cursor on the annotation."""
+        self.nbsock.last_buf = self.buf
+        self.nbsock.last_buf.lnum = self.lnum
+        self.nbsock.last_buf.col = 0
+
+        self.nbsock.send_cmd(self.buf, 'setDot', '%d/0' % self.lnum)
 
     def remove_anno(self):
         """Remove the annotation."""
@@ -247,13 +274,24 @@ class FrameAnnotation(Annotation):
             self.buf.define_frameanno()
             self.nbsock.send_cmd(self.buf, 'addAnno', '%d %d %d/0 -1'
                             % (self.sernum, self.buf.frame_typeNum, self.lnum))
-            self.nbsock.last_buf = self.buf
-            self.nbsock.last_buf.lnum = self.lnum
-            self.nbsock.last_buf.col = 0
-
-            self.nbsock.send_cmd(self.buf, 'setDot', '%d/0' % self.lnum)
+            self.setdot()
             self.is_set = True
 
+    def move(self, lnum, setdot=False):
+        """Move the annotation to 'lnum' in the same buffer.
+
+        Nothing is sent to Vim when the sign is already placed at 'lnum',
+        except for setting the cursor on the sign when 'setdot' is True.
+
+        """
+        if self.is_set and self.buf.registered and lnum == self.lnum:
+            if setdot:
+                self.setdot()
+            return
+        self.remove_anno()
+        self.lnum = lnum
+        self.buf.update(FRAME_ANNO_ID)
+
     def __repr__(self):
         """Return frame information."""
         return 'frame at line %d' % self.lnum
@@ -268,8 +306,18 @@ class BufferSet(dict):
             the list of Buffer instances indexed by netbeans 'bufID'
         anno_dict: dictionary
             global dictionary of all annotations {anno_id: Buffer instance}
-
-    A Buffer instance is never removed from BufferSet.
+        killed: OrderedDict
+            the Buffer instances killed by Vim {pathname: Buffer instance},
+            the least recently killed first
+        evicted: dict
+            the netbeans 'bufID' of evicted buffers {pathname: buf_id}
+
+    A Buffer instance is removed from BufferSet only after it has been killed
+    by Vim, when it does not hold any annotation and when more than
+    MAX_KILLED_BUFFERS buffers have been killed since. Its slot in buf_list is
+    left as a None tombstone and its 'bufID' is given back to a new Buffer
+    instance with the same pathname, so that netbeans buffer numbers are never
+    reused for another file.
 
     """
 
@@ -277,8 +325,10 @@ class BufferSet(dict):
         self.nbsock = nbsock
         self.buf_list = []
         self.anno_dict = {}
+        self.killed = OrderedDict()
+        self.evicted = {}
 
-    def add_anno(self, anno_id, pathname, lnum):
+    def add_anno(self, anno_id, pathname, lnum, disabled=False):
         """Add the annotation to the global list and to the buffer annotation
         list."""
         if not isinstance(lnum, int) or lnum <= 0:
@@ -288,7 +338,7 @@ class BufferSet(dict):
                 '"pathname" is not an absolute path: %s' % pathname)
         buf = self[pathname]
         self.anno_dict[anno_id] = buf
-        buf.add_anno(anno_id, lnum)
+        buf.add_anno(anno_id, lnum, disabled)
 
     def update_anno(self, anno_id, disabled=False):
         """Update the annotation."""
@@ -306,16 +356,23 @@ class BufferSet(dict):
         self.anno_dict[anno_id].delete_anno(anno_id)
         del self.anno_dict[anno_id]
 
-    def show_frame(self, pathname=None, lnum=1):
+    def show_frame(self, pathname=None, lnum=1, setdot=False):
         """Show the frame annotation.
 
         The frame annotation is unique.
         Remove the frame annotation when pathname is None.
+        The annotation is moved in place when it is already shown in the same
+        buffer and nothing is sent to Vim when it is not moved, unless
+        'setdot' is True.
 
         """
         if not isinstance(lnum, int) or lnum <= 0:
             raise ValueError('"lnum" must be strictly positive: %s' % lnum)
         if FRAME_ANNO_ID in self.anno_dict.keys():
+            buf = self.anno_dict[FRAME_ANNO_ID]
+            if pathname and self[pathname] is buf:
+                buf[FRAME_ANNO_ID].move(lnum, setdot)
+                return
             self.delete_anno(FRAME_ANNO_ID)
         if pathname:
             self.add_anno(FRAME_ANNO_ID, pathname, lnum)
@@ -339,13 +396,67 @@ class BufferSet(dict):
             error('attempt to update an unknown annotation')
             return False
 
+    def move_bp(self, bp_id, pathname, lnum, disabled=False):
+        """Move the breakpoint to 'lnum' in 'pathname'.
+
+        The sign is moved in place when the breakpoint stays in the same
+        buffer, otherwise it is removed from its buffer and added to the new
+        one.
+
+        """
+        if not isinstance(lnum, int) or lnum <= 0:
+            raise ValueError('"lnum" must be strictly positive: %s' % lnum)
+        buf = self.anno_dict.get(bp_id)
+        if buf is not None:
+            if self[pathname] is buf:
+                buf.move_anno(bp_id, lnum, disabled)
+                return
+            self.delete_anno(bp_id)
+            del buf[bp_id]
+        self.add_anno(bp_id, pathname, lnum, disabled)
+
     def getbuf(self, buf_id):
-        """Return the Buffer at idx in list."""
+        """Return the Buffer at idx in list or None when evicted."""
         assert isinstance(buf_id, int)
         if buf_id <= 0 or buf_id > len(self.buf_list):
             return None
         return self.buf_list[buf_id - 1]
 
+    def buffer_killed(self, buf):
+        """Record that 'buf' has been killed by Vim.
+
+        Evict the least recently killed buffers above MAX_KILLED_BUFFERS that
+        have not been registered again and that do not hold any annotation.
+
+        """
+        if buf.editport is not None:
+            return
+        self.killed.pop(buf.name, None)
+        self.killed[buf.name] = buf
+
+        excess = len(self.killed) - MAX_KILLED_BUFFERS
+        for pathname in list(self.killed.keys()):
+            if excess <= 0:
+                break
+            buf = self.killed[pathname]
+            if buf.registered:
+                # The buffer has been loaded again in Vim.
+                del self.killed[pathname]
+                excess -= 1
+            elif not buf:
+                # No annotations.
+                self.evict(pathname)
+                excess -= 1
+
+    def evict(self, pathname):
+        """Remove the Buffer instance of a killed buffer."""
+        buf = self.killed.pop(pathname)
+        assert not buf and not buf.registered
+        self.buf_list[buf.buf_id - 1] = None
+        self.evicted[pathname] = buf.buf_id
+        dict.__delitem__(self, pathname)
+        info('evict buffer %d: %s', buf.buf_id, pathname)
+
     def remove_all(self):
         """Remove all annotations.
 
@@ -384,9 +495,14 @@ class BufferSet(dict):
             raise ValueError(
                 '"pathname" is not an absolute path: %s' % pathname)
         if not pathname in self:
-            # netbeans buffer numbers start at one
-            buf = Buffer(pathname, len(self.buf_list) + 1, self.nbsock)
-            self.buf_list.append(buf)
+            buf_id = self.evicted.pop(pathname, None)
+            if buf_id is not None:
+                buf = Buffer(pathname, buf_id, self.nbsock)
+                self.buf_list[buf_id - 1] = buf
+            else:
+                # netbeans buffer numbers start at one
+                buf = Buffer(pathname, len(self.buf_list) + 1, self.nbsock)
+                self.buf_list.append(buf)
             dict.__setitem__(self, pathname, buf)
         return dict.__getitem__(self, pathname)
 
@@ -399,7 +515,7 @@ class BufferSet(dict):
         return self.__getitem__(pathname)
 
     def __delitem__(self, key):
-        """A key is never removed."""
+        """A key is only removed on eviction."""
         pass
 
     def __len__(self):
@@ -298,6 +298,34 @@ class Debugger(object):
         """
         self.__nbsock.delete_bp(bp_id)
 
+    def move_bp(self, bp_id, pathname, lnum, disabled=False):
+        """Move a breakpoint to 'lnum' in a Vim buffer.
+
+        The sign is moved in place, or added when the breakpoint has no sign.
+
+        Method parameters:
+            bp_id: object
+                The debugger breakpoint id.
+            pathname: str
+                The absolute pathname to the Vim buffer.
+            lnum: int
+                The line number in the Vim buffer.
+            disabled: bool
+                When True, set the breakpoint as disabled.
+
+        """
+        self.__nbsock.move_bp(bp_id, pathname, lnum, disabled)
+
+    def start_atomic(self):
+        """Start a section of sign updates that Vim displays at once."""
+        if self.__nbsock:
+            self.__nbsock.start_atomic()
+
+    def end_atomic(self):
+        """End the section of sign updates."""
+        if self.__nbsock:
+            self.__nbsock.end_atomic()
+
     def remove_all(self):
         """Remove all annotations.
 
@@ -355,6 +383,10 @@ class Debugger(object):
             return
 
         lbuf = self.__nbsock.list_buffers[bufname]
+        # A hidden list buffer is updated when it is opened.
+        if lbuf.hidden and bufname != 'variables' and not self.closed:
+            return
+
         if dirty and not lbuf.buf.registered:
             lbuf.register()
 
@@ -370,20 +402,37 @@ class Debugger(object):
     def update_tabpage_buffers(self):
         """Update all the list buffers that may be located in a tab page."""
 
-    def show_frame(self, pathname=None, lnum=1):
+    def load_more(self, bufname):
+        """Load more lines in the 'bufname' list buffer."""
+
+    def listbuffer_hidden(self, bufname):
+        """Return True when the 'bufname' list buffer is not displayed."""
+        nbsock = self.__nbsock
+        return bool(nbsock and nbsock.list_buffers and
+                    nbsock.list_buffers[bufname].hidden)
+
+    def listbuffer_opened(self, bufname):
+        """Refresh the 'bufname' list buffer that has just been opened."""
+
+    def show_frame(self, pathname=None, lnum=1, setdot=False):
         """Show the frame highlighted sign in a Vim buffer.
 
         The frame sign is unique.
         Remove the frame sign when 'pathname' is None.
+        Nothing is sent to Vim when the frame sign is already set at this
+        location, unless 'setdot' is True.
 
         Method parameters:
             pathname: str
                 The absolute pathname to the Vim buffer.
             lnum: int
                 The line number in the Vim buffer.
+            setdot: bool
+                When True, set the cursor on the frame sign even when
+                the sign is not moved.
 
         """
-        self.__nbsock.show_frame(pathname, lnum)
+        self.__nbsock.show_frame(pathname, lnum, setdot)
 
     def balloon_text(self, text):
         """Process a netbeans balloonText event.
@@ -15,10 +15,11 @@ import subprocess
 import re
 import time
 import pkgutil
+import json
 import collections
 from itertools import takewhile
 
-from . import TESTFN_FILE, ClewnError, gdbmi, misc, debugger
+from . import TESTFN_FILE, ClewnError, text_type, gdbmi, misc, debugger
 from .process import Process
 
 # On most other platforms the best timer is time.time()
@@ -35,6 +36,14 @@ set width 0
 set annotate 1
 """
 COMPLETION_TIMEOUT = 10 # seconds
+# the symbol index is built after this delay without user commands
+SYMBOLS_IDLE_DELAY = 1 # seconds
+
+# the file name of the cache of the gdb batch results, in the pyclewn cache
+# directory
+GDB_CACHE = 'gdb_batch.json'
+# maximum number of oob commands sent to gdb and waiting for their result
+OOB_PIPELINE_DEPTH = 32
 SETFMTVAR_FORMATS = ('binary', 'decimal', 'hexadecimal', 'octal', 'natural')
 COMPLETION = ('command! -bar -nargs=* -complete=customlist,s:GdbComplete' +
               debugger.COMPLETION_SUFFIX)
@@ -76,6 +85,8 @@ RE_ANNO_1 = r'^[~@&]"\\032\\032([a-zA-Z]:|)[^:]+:[^:]+:[^:]+:[^:]+:[^:]+$'  \
             r'# annotation level 1'                                         \
             r'# ^Z^ZFILENAME:LINE:CHARACTER:MIDDLE:ADDR'                    \
             r'# ^Z^ZD:FILENAME:LINE:CHARACTER:MIDDLE:ADDR'
+# the start of an annotation level 1 after the stream record type
+ANNO_1_PREFIX = r'"\032\032'
 RE_FINISH = r'(gdb-result-var|return-value)=%s'                 \
             r'# return value after Cfinish' % misc.QUOTED_STRING
 RE_VIM_COMMAND = r'^[a-zA-Z0-9]+$'                              \
@@ -109,6 +120,63 @@ def gdb_batch(pgm, job):
 
     return result.decode()
 
+def gdb_pathname(pgm):
+    """Return the path name of the gdb program, None when not found."""
+    if os.path.dirname(pgm):
+        return os.path.realpath(pgm) if os.path.isfile(pgm) else None
+    for dirname in os.environ.get('PATH', '').split(os.pathsep):
+        pathname = os.path.join(dirname, pgm)
+        if os.path.isfile(pathname) and os.access(pathname, os.X_OK):
+            return os.path.realpath(pathname)
+    return None
+
+def gdb_cache_pathname():
+    """Return the path name of the cache of the gdb batch results."""
+    cache_dir = (os.environ.get('XDG_CACHE_HOME') or
+                 os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_dir, 'pyclewn', GDB_CACHE)
+
+def cached_gdb_batch(pgm, job):
+    """Run job in gdb batch mode and return the result as a string.
+
+    The result is cached on disk and used again as long as the path name,
+    size and modification time of the gdb program do not change.
+
+    """
+    pathname = gdb_pathname(pgm)
+    if not pathname:
+        return gdb_batch(pgm, job)
+    stat = os.stat(pathname)
+    key = [pathname, stat.st_size, stat.st_mtime]
+
+    cache_pathname = gdb_cache_pathname()
+    try:
+        with open(cache_pathname) as f:
+            cache = json.load(f)
+    except (IOError, OSError, ValueError):
+        cache = {}
+    entry = cache.get(pathname)
+    if not isinstance(entry, dict) or entry.get('key') != key:
+        entry = cache[pathname] = {'key': key, 'jobs': {}}
+    elif job in entry['jobs']:
+        return entry['jobs'][job]
+
+    result = gdb_batch(pgm, job)
+    if not result:
+        return result
+    entry['jobs'][job] = result
+    try:
+        dirname = os.path.dirname(cache_pathname)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        tmpname = '%s.%d' % (cache_pathname, os.getpid())
+        with open(tmpname, 'w') as f:
+            f.write(text_type(json.dumps(cache)))
+        os.rename(tmpname, cache_pathname)
+    except (IOError, OSError) as err:
+        info('cannot write the gdb cache %s: %s', cache_pathname, err)
+    return result
+
 def parse_gdb_version(header):
     r"""Parse the gdb version from the gdb header.
 
@@ -175,7 +243,7 @@ def gdb_version(pgm):
             except OSError as err:
                 raise ClewnError("Gdb cannot open the terminal: %s" % err)
 
-    header = gdb_batch(pgm, 'show version')
+    header = cached_gdb_batch(pgm, 'show version')
     version = parse_gdb_version(header)
     if version:
         if version < GDB_VERSION:
@@ -313,7 +381,7 @@ class GlobalSetup(misc.Singleton):
         nocomplt_cmds = self.illegal_cmds + self.filename_complt
 
         # Get the list of gdb commands.
-        for cmd in (x[2:-3] for x in gdb_batch(
+        for cmd in (x[2:-3] for x in cached_gdb_batch(
                                 self.gdbname, 'complete').splitlines()
                                 if x.startswith('~"') and x.endswith(r'\n"')):
             if not cmd:
@@ -336,7 +404,7 @@ class GlobalSetup(misc.Singleton):
                 firstarg_complt += 'complete %s \n' % cmd
 
         # Get first arg completion commands.
-        for result in (x[2:-3] for x in gdb_batch(
+        for result in (x[2:-3] for x in cached_gdb_batch(
                                 self.gdbname, firstarg_complt).splitlines()
                                 if x.startswith('~"') and x.endswith(r'\n"')):
             matchobj = re_completion.match(result)
@@ -410,6 +478,8 @@ class Gdb(debugger.Debugger, Process):
             False when gdb is ready to accept commands
         oob: iterator
             iterator over the list of OobCommand and VarObjCmd instances
+        oob_cnt: int
+            number of oob command results received in the current sequence
         stream_record: list
             list of gdb/mi stream records output by a command
         lastcmd: gdbmi.MiCommand or gdbmi.CliCommand or gdbmi.ShowBalloon
@@ -495,6 +565,8 @@ class Gdb(debugger.Debugger, Process):
         self.curcmdline = ''
         self.firstcmdline = None
         self.time = None
+        self.cmd_time = 0
+        self.inferior_running = False
         self.multiple_choice = 0
         self.cmd_fifo = collections.deque()
         self.async = False
@@ -590,7 +662,29 @@ class Gdb(debugger.Debugger, Process):
             # do not pop a command from fifo while multiple_choice pending
             return
 
-        if self.cmd_fifo and self.accepting_cmd():
+        self.dispatch_cmd_fifo()
+
+        # Display the signs of the =breakpoint-* async records received
+        # while gdb is idle.
+        if self.accepting_cmd():
+            self.info.end_bp_atomic()
+
+        # Refresh the sources list once the loading of libraries has settled.
+        if (self.state == self.STATE_RUNNING and self.accepting_cmd() and
+                self.oob_list.get_oobcmd(gdbmi.Sources).settled()):
+            self.clicmd_notify(console=False, nop=True)
+
+        # Build the symbol index one page at a time while gdb is idle.
+        elif (self.state == self.STATE_RUNNING and self.accepting_cmd() and
+                not self.cmd_fifo and not self.inferior_running and
+                self.info.symbols.pages and not self.info.symbols.fetching and
+                _timer() - self.cmd_time > SYMBOLS_IDLE_DELAY):
+            gdbmi.SymbolsCommand(self).sendcmd()
+
+    def dispatch_cmd_fifo(self):
+        """Run the queued commands while gdb is ready to process them."""
+        while (self.cmd_fifo and self.accepting_cmd() and
+                not self.multiple_choice):
             (method, cmd, args) = self.cmd_fifo.popleft()
             debugger.Debugger._do_cmd(self, method, cmd, args)
 
@@ -602,6 +696,10 @@ class Gdb(debugger.Debugger, Process):
         """Do the command end processing."""
         self.gdb_busy = False
         self.multiple_choice = 0
+        # A page of the symbol index lost with the pending results after a
+        # SIGINT is fetched again.
+        self.info.symbols.fetching = False
+        self.info.end_bp_atomic()
         if self.doprompt:
             self.doprompt = False
             self.print_prompt()
@@ -629,6 +727,11 @@ class Gdb(debugger.Debugger, Process):
             info('oob commands execution: %f second' % (_timer() - self.time))
             self.time = None
 
+        # Do not wait for gdb_background_jobs to run the next queued command.
+        # A pending stopped event is processed first by process_oob().
+        if not self.unhandled_stopped_evt:
+            self.dispatch_cmd_fifo()
+
     def handle_strrecord(self, cmd):
         """Process the stream records."""
         stream_record = ''.join(self.stream_record)
@@ -651,26 +754,35 @@ class Gdb(debugger.Debugger, Process):
             self.process_stream_record(line)
         elif line[0] in '&':
             # write the 'log' stream record to the console
-            matchobj = misc.re_quoted.match(line[1:])
-            if matchobj:
-                line = misc.unquote(matchobj.group(1))
-                self.stream_record.append(line)
+            text = gdbmi.parse_stream_record(line)
+            if text is not None:
+                self.stream_record.append(text)
             else:
                 warning('bad format in gdb/mi log: "%s"', line)
         elif line[0] in '*+=':
             # An 'async' record.
             info(line[1:])
+            if line.startswith('=breakpoint-'):
+                self.info.breakpoint_notification(line)
+            elif line.startswith('=thread-'):
+                self.info.thread_notification(line)
             # Notify the Sources oob command that a library is being loaded.
-            if line.startswith('=library-loaded'):
-                sources_oobcmd = self.oob_list.get_oobcmd(gdbmi.Sources)
-                sources_oobcmd.notify(None, force=True)
+            elif line.startswith('=library-loaded'):
+                self.oob_list.get_oobcmd(gdbmi.Sources).library_loaded()
             elif line.startswith('*running,'):
+                self.info.thread_notification(line)
+                self.inferior_running = True
                 self.doprompt = False
                 self.info.hide_frame()
             elif line.startswith('*stopped,'):
+                self.info.thread_notification(line)
+                self.inferior_running = False
+                # The source files may have changed while the program was
+                # running.
+                self.info.stat_cache = {}
                 if self.oob is None:
                     self.clicmd_notify('', console=False)
-                elif self.oob_cnt > 1:
+                elif self.oob_cnt > 0:
                     self.unhandled_stopped_evt = True
                 else:
                     self.doprompt = True
@@ -696,19 +808,17 @@ class Gdb(debugger.Debugger, Process):
 
     def process_stream_record(self, line):
         """Process a received gdb/mi stream record."""
-        matchobj = misc.re_quoted.match(line[1:])
-        annotation_lvl1 = re_anno_1.match(line)
-        if annotation_lvl1 is not None:
+        if line.startswith(ANNO_1_PREFIX, 1) and re_anno_1.match(line):
             return
-        if matchobj:
-            line = misc.unquote(matchobj.group(1))
-            if (not self.stream_record and line == '[0] cancel\n[1] all\n') \
+        text = gdbmi.parse_stream_record(line)
+        if text is not None:
+            if (not self.stream_record and text == '[0] cancel\n[1] all\n') \
                     or (not self.multiple_choice                            \
                             and len(self.stream_record) == 1                \
                             and self.stream_record[0] == '[0] cancel\n'     \
-                            and line.startswith('[1] all\n')):
+                            and text.startswith('[1] all\n')):
                 self.multiple_choice = _timer()
-            self.stream_record.append(line)
+            self.stream_record.append(text)
         else:
             warning('process_stream_record: bad format: "%s"', line)
 
@@ -747,6 +857,8 @@ class Gdb(debugger.Debugger, Process):
             else:
                 cmd.handle_result(result)
 
+            if self.oob is not None:
+                self.oob_cnt += 1
             self.process_oob()
 
     def process_prompt(self):
@@ -760,7 +872,13 @@ class Gdb(debugger.Debugger, Process):
             self.process_oob()
 
     def process_oob(self):
-        """Process OobCommands."""
+        """Process OobCommands.
+
+        Send the oob commands without waiting for the previous results, with at
+        most OOB_PIPELINE_DEPTH results pending. Wait for all the pending
+        results before running an OobCommand whose 'barrier' is set.
+
+        """
         # got the prompt for a user command
         if self.lastcmd is not None:
             # prepare the next sequence of oob commands
@@ -780,14 +898,13 @@ class Gdb(debugger.Debugger, Process):
 
             self.lastcmd = None
 
-        # send the next oob command
+        # send the next oob commands
         if self.oob is not None:
             try:
-                # loop over oob commands that don't send anything
-                while True:
-                    if next(self.oob)():
-                        self.oob_cnt += 1
+                while len(self.results) < OOB_PIPELINE_DEPTH:
+                    if len(self.results) and self.oob.must_wait():
                         break
+                    next(self.oob)()
             except StopIteration:
                 self.oob = None
                 self.terminate_cmd()
@@ -817,6 +934,24 @@ class Gdb(debugger.Debugger, Process):
         Process.write(self, data)
         debug(data.rstrip('\n'))
 
+    def listbuffer_opened(self, bufname):
+        """Fetch and render the list buffer when it is stale."""
+        if not self.accepting_cmd():
+            return
+        if any(getattr(oob, 'listbuffer', None) == bufname and oob.trigger
+                                                    for oob in self.oob_list):
+            self.clicmd_notify(console=False, nop=True)
+        else:
+            self.update_tabpage_buffers()
+
+    def load_more(self, bufname):
+        """Load the next frames of the backtrace."""
+        info = self.info
+        if (bufname == 'backtrace' and self.accepting_cmd() and
+                len(info.backtrace) < info.backtrace_depth):
+            info.backtrace_size += gdbmi.BACKTRACE_CHUNK
+            self.clicmd_notify(console=False, nop=True)
+
     def update_tabpage_buffers(self):
         debugger.Debugger.update_tabpage_buffers(self)
         self.update_listbuffer('breakpoints', self.info.collect_breakpoints,
@@ -866,9 +1001,11 @@ class Gdb(debugger.Debugger, Process):
         """Process 'cmd' and its 'args' with 'method'.
 
         Execute directly the command when running in non-async mode.
-        Otherwise, flush the cmd_fifo on receiving a sigint and send it,
-        or queue the command to the fifo.
+        Otherwise, flush the cmd_fifo on receiving a sigint and send it, or
+        queue the command to the fifo and run it at once when gdb is ready to
+        process it.
         """
+        self.cmd_time = _timer()
         if method == self.cmd_sigint:
             self.lastcmd = ''
 
@@ -883,6 +1020,7 @@ class Gdb(debugger.Debugger, Process):
 
         # queue the command as a tuple
         self.cmd_fifo.append((method, cmd, args))
+        self.dispatch_cmd_fifo()
 
     def pre_cmd(self, cmd, args):
         """The method called before each invocation of a 'cmd_xxx' method."""
@@ -975,10 +1113,38 @@ class Gdb(debugger.Debugger, Process):
         self.default_cmd_processing(cmd, args)
 
     def cmd_dbgvar(self, cmd, args):
-        """Add a variable to the debugger variable buffer."""
-        varobj = gdbmi.VarObj({'exp': args})
-        if gdbmi.VarCreateCommand(self, varobj).sendcmd():
-            self.oob_list.push(gdbmi.VarObjCmdEvaluate(self, varobj))
+        """Add variables to the debugger variable buffer.
+
+        The expressions are separated by semicolons. Several expressions are
+        created in one batch of pipelined commands, followed by a single
+        update of the oob commands.
+
+        """
+        expressions = []
+        start = 0
+        for token, idx in misc.scan_matches(args, (';', ';')):
+            expressions.append(args[start:idx].strip())
+            start = idx + 1
+        expressions.append(args[start:].strip())
+        expressions = [exp for exp in expressions if exp]
+
+        if len(expressions) <= 1:
+            varobj = gdbmi.VarObj({'exp': expressions[0] if expressions
+                                                            else args})
+            if gdbmi.VarCreateCommand(self, varobj).sendcmd():
+                self.oob_list.push(gdbmi.VarObjCmdEvaluate(self, varobj))
+            return
+
+        varobjs = [gdbmi.VarObj({'exp': exp}) for exp in expressions]
+        for varobj in varobjs:
+            self.oob_list.push(gdbmi.VarObjCmdCreate(self, varobj))
+        evaluate = [gdbmi.VarObjCmdEvaluate(self, varobj) for varobj in varobjs]
+        # The varobjs are named by the results of their creation.
+        evaluate[0].barrier = True
+        for oob in evaluate:
+            self.oob_list.push(oob)
+        # nop command used to trigger execution of the oob_list
+        self.clicmd_notify(console=False, nop=True)
 
     def cmd_delvar(self, cmd, args):
         """Delete a variable from the debugger variable buffer."""
@@ -1016,7 +1182,16 @@ class Gdb(debugger.Debugger, Process):
                 errmsg = 'Not a line number.'
         if not errmsg:
             rootvarobj = self.info.varobj
-            if lnum in rootvarobj.parents:
+            if lnum in rootvarobj.more:
+                # load the next children
+                varobj = rootvarobj.more[lnum]
+                if not gdbmi.ListChildrenCommand(self, varobj).sendcmd(
+                                                len(varobj['children'])):
+                    return
+                self.oob_list.push(gdbmi.VarObjCmdUpdateRange(self, varobj))
+                self.foldlnum = lnum
+                return
+            elif lnum in rootvarobj.parents:
                 varobj = rootvarobj.parents[lnum]
                 # collapse
                 if varobj['children']:
@@ -1032,6 +1207,8 @@ class Gdb(debugger.Debugger, Process):
                 else:
                     if not gdbmi.ListChildrenCommand(self, varobj).sendcmd():
                         return
+                    self.oob_list.push(
+                                gdbmi.VarObjCmdUpdateRange(self, varobj))
                 self.foldlnum = lnum
                 if not errmsg:
                     return
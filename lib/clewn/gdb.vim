@@ -13,6 +13,7 @@ augroup clewn
 
     autocmd BufEnter (clewn)_backtrace nnoremap <buffer> <silent> <CR> :call <SID>goto_frame()<CR>
     autocmd BufEnter (clewn)_backtrace nnoremap <buffer> <silent> <2-Leftmouse> :call <SID>goto_frame()<CR>
+    autocmd CursorMoved (clewn)_backtrace call <SID>more_frames()
 
     autocmd BufEnter (clewn)_threads nnoremap <buffer> <silent> <CR> :call <SID>goto_thread()<CR>
     autocmd BufEnter (clewn)_threads nnoremap <buffer> <silent> <2-Leftmouse> :call <SID>goto_thread()<CR>
@@ -71,6 +72,15 @@ function! <SID>goto_frame()
             call pyclewn#buffers#GotoFrame(l:fname)
         endif
         exe "%(pre)sframe " . l:id
+    else
+        call <SID>more_frames()
+    endif
+endfunction
+
+" Load the next frames when the cursor reaches the last line.
+function! <SID>more_frames()
+    if line(".") == line("$") && getline(".") =~# '^  \.\.\. .* more frames$'
+        exe "nbkey ClewnBuffer.backtrace.more"
     endif
 endfunction
 
@@ -204,6 +214,9 @@ function! s:GdbComplete(arglead, cmdline, curpos)
     endif
     exe "nbkey complete " . l:cmdline
 
+    " Poll the ack file with a short delay first: a completion served from
+    " the symbol index is ready after a few milliseconds.
+    let l:delay = 5
     while 1
         " Pyclewn signals that complete_tmpfile is ready for reading.
         if getfsize(%(ack_tmpfile)s) > 0
@@ -217,7 +230,8 @@ function! s:GdbComplete(arglead, cmdline, curpos)
         if localtime() - l:start > %(completion_timeout)s
             return []
         endif
-        sleep 100m
+        exe "sleep " . l:delay . "m"
+        let l:delay = min([l:delay * 2, 100])
     endwhile
 endfunction
 
@@ -21,6 +21,10 @@ The instance of the Info class contains all this data.
 
 The oob commands also perform actions such as: source the project file, update
 the breakpoints and frame sign, create/delete/update the varobj objects.
+
+The oob commands are pipelined: they are sent to gdb without waiting for the
+result of the previous one. Gdb processes its commands in sequence, so their
+results are received and processed in the order of the OobList.
 """
 
 # Python 2-3 compatibility.
@@ -34,12 +38,19 @@ import sys
 import os
 import re
 import io
+import time
+import string
+import bisect
 import traceback
 import collections
 from abc import ABCMeta, abstractmethod
 from collections import OrderedDict
+try:
+    from collections.abc import Mapping, Sequence
+except ImportError:
+    from collections import Mapping, Sequence
 
-from . import PY3, text_type, misc
+from . import PY3, PY37, text_type, misc
 
 # set the logging methods
 (critical, error, warning, info, debug) = misc.logmethods('mi')
@@ -47,6 +58,22 @@ from . import PY3, text_type, misc
 VAROBJ_FMT = '%%(name)-%ds: (%%(type)-%ds) %%(exp)-%ds %%(chged)s%%(value)s\n'
 DYN_VAROBJ_FMT = '%%(name)-%ds: %%(exp)-%ds %%(chged)s%%(value)s\n'
 
+# the VarObj attribute of each varobj key, the 'chged' key is the change marker
+VAROBJ_KEYS = {
+    'name': 'name',
+    'exp': 'exp',
+    'type': 'type',
+    'value': 'value',
+    'chged': 'marker',
+    'in_scope': 'in_scope',
+    'numchild': 'numchild',
+    'dynamic': 'dynamic',
+    'has_more': 'has_more',
+    }
+
+# the varobj keys whose values are shared among all the varobj objects
+VAROBJ_INTERNED = ('type', 'in_scope', 'numchild', 'dynamic', 'has_more')
+
 BREAKPOINT_CMDS = ()
 FILE_CMDS = ()
 FRAME_CMDS = ()
@@ -59,6 +86,36 @@ DIRECTORY_CMDS = (
 
 SOURCE_CMDS = ('file', 'exec-file', 'core-file', 'symbol-file',
                'add-symbol-file')
+
+# delay after the last =library-loaded record before fetching the sources
+LIBRARY_LOADED_DELAY = .500
+
+# above this number of threads in an unknown state, fetch all the threads
+THREADS_QUERY_MAX = 16
+
+# number of frames of the backtrace fetched at a time
+BACKTRACE_CHUNK = 100
+
+# number of children of a varobj fetched at a time
+CHILDREN_CHUNK = 100
+
+# in the last line of a list of completions truncated by gdb
+TRUNCATED_COMPLETION = 'max-completions reached'
+
+# the regular expressions of the 'info functions' pages fetched to build the
+# symbol index, one page per first character of the function names
+SYMBOLS_PAGES = tuple('^' + c for c in string.ascii_letters + '_')
+
+# the commands whose location argument is completed with the symbol index
+LOCATION_CMDS = ('break', 'b', 'br', 'bre', 'brea', 'tbreak', 'tb', 'until',
+                 'u', 'advance', 'jump', 'j', 'clear', 'list', 'l')
+
+# gdb does not count the frames of the backtrace beyond this depth
+BACKTRACE_DEPTH_MAX = 10000
+
+# gdb/mi token range, gdb/mi records are matched with a three digits token
+TOKEN_MIN = 100
+TOKEN_MAX = 999
 PROJECT_CMDS = ('project', 'r', 'start', 'source') + SOURCE_CMDS
 
 # gdb objects attributes.
@@ -93,6 +150,19 @@ RE_VAREVALUATE = keyval_pattern(VAREVALUATE_ATTRIBUTES, 'done,value="14"')
 RE_ARGS = r'\s*"(?P<args>.+)"\.'                                            \
              r'# "toto "begquot endquot" titi".'
 
+# A gdb/mi c-string, a variable name followed by '=' or a bracket. The commas
+# are skipped.
+RE_MI_TOKEN = r'"([^"\\]*(?:\\.[^"\\]*)*)"|([a-zA-Z_][a-zA-Z0-9_-]*)=|([][{}])'
+
+# A gdb/mi c-string or an opening bracket.
+RE_MI_SCAN = r'"[^"\\]*(?:\\.[^"\\]*)*"|[{[]'
+
+# The text up to the next bracket that is not within a c-string.
+RE_MI_BRACKET = r'[^][{}"]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^][{}"]*)*([][{}])'
+
+RE_MI_ESCAPE = r'((?:\\[0-7]{1,3})+)|\\(.)'                                \
+               r'# RE: a sequence of octal escapes or an escape sequence'
+
 RE_DIRECTORIES = r'(?P<path>[^' + os.pathsep + r'^\n]+)'                    \
                  r'# /path/to/foobar:$cdir:$cwd\n'
 
@@ -126,38 +196,69 @@ RE_FRAME = keyval_pattern(FRAME_ATTRIBUTES)
 #      line="510"},
 #   state="stopped",core="3"}],
 # current-thread-id="1"]'
-RE_THREADS = '({.*})|current-thread-id="(\d+)"'
 
-RE_THREADS_ATTRIBUTES = keyval_pattern(THREADS_ATTRIBUTES)
 
 RE_PGMFILE = r'\s*"(?P<debuggee>[^"]+)"\.'                                  \
              r'# "/path/to/pyclewn/testsuite/foobar".'
 
+RE_DEPTH = r'"(?P<depth>\d+)"# "12"'
+
 RE_PWD = r'"(?P<cwd>[^"]+)"# "/home/xavier/src/pyclewn_wa/trunk/pyclewn"'
 
+RE_BPDELETED = r'^=breakpoint-deleted,id="(?P<id>\d+)"'                     \
+               r'# =breakpoint-deleted,id="1"'
+
+RE_THREADEVT = r'^=thread-(?P<evt>created|exited|selected),id="(?P<id>\d+)"'  \
+               r'# =thread-created,id="2",group-id="i1"'
+
+RE_THREADID = r'thread-id="(?P<id>all|\d+)"'                                 \
+              r'# *running,thread-id="all"'
+
+RE_STOPPEDTHREADS = r'stopped-threads=(?P<threads>"all"|\[[^]]*\])'         \
+                    r'# stopped-threads=["1","3"]'
+
+RE_HASMORE = r'has_more="(?P<has_more>\d+)"# ],has_more="1"'
+
+RE_OPERATOR = r'operator\b\s*(?:\(\)|\[\]|(?:new|delete)\b\s*(?:\[\])?'     \
+              r'|[-+*/%^&|~!=<>,]+|[^(]+)'                                  \
+              r'# operator==(A const&, A const&);'
+
+RE_NONDEBUG = r'0x[0-9a-fA-F]+\s+(?P<name>\S+)$'                            \
+              r'# 0x0000000000401030  fork@plt'
+
+RE_LOCATION = r'[\w:~]+$'                                                   \
+              r'# ns::foo_'
+
 # compile regexps
-re_evalkey = re.compile(r'([a-zA-Z0-9_-]+)=')
 re_evaluate = re.compile(RE_EVALUATE, re.VERBOSE)
 re_varcreate = re.compile(RE_VARCREATE, re.VERBOSE)
 re_vardelete = re.compile(RE_VARDELETE, re.VERBOSE)
 re_setfmtvar = re.compile(RE_SETFMTVAR, re.VERBOSE)
 re_varevaluate = re.compile(RE_VAREVALUATE, re.VERBOSE)
+re_hasmore = re.compile(RE_HASMORE, re.VERBOSE)
+re_operator = re.compile(RE_OPERATOR, re.VERBOSE)
+re_nondebug = re.compile(RE_NONDEBUG, re.VERBOSE)
+re_location = re.compile(RE_LOCATION, re.VERBOSE)
 re_args = re.compile(RE_ARGS, re.VERBOSE)
 re_directories = re.compile(RE_DIRECTORIES, re.VERBOSE)
 re_file = re.compile(RE_FILE, re.VERBOSE)
 re_framecli = re.compile(RE_FRAMECLI, re.VERBOSE)
 re_frame = re.compile(RE_FRAME, re.VERBOSE)
-re_threads = re.compile(RE_THREADS)
-re_threads_attributes = re.compile(RE_THREADS_ATTRIBUTES)
 re_pgmfile = re.compile(RE_PGMFILE, re.VERBOSE)
 re_pwd = re.compile(RE_PWD, re.VERBOSE)
-
-def get_pathname(name, source):
-    """Return a valid path name, matching name in the source dictionary."""
-    if source:
-        pathname = source['fullname'] if source['file'] == name else ''
-        if pathname and os.path.exists(pathname):
-            return pathname
+re_depth = re.compile(RE_DEPTH, re.VERBOSE)
+re_bpdeleted = re.compile(RE_BPDELETED, re.VERBOSE)
+re_threadevt = re.compile(RE_THREADEVT, re.VERBOSE)
+re_threadid = re.compile(RE_THREADID, re.VERBOSE)
+re_stoppedthreads = re.compile(RE_STOPPEDTHREADS, re.VERBOSE)
+re_threadids = re.compile(r'"(\d+)"')
+re_mi_token = re.compile(RE_MI_TOKEN)
+re_mi_scan = re.compile(RE_MI_SCAN)
+re_mi_bracket = re.compile(RE_MI_BRACKET)
+re_mi_escape = re.compile(RE_MI_ESCAPE, re.VERBOSE)
+
+MI_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f',
+              'a': '\a', 'v': '\v', 'e': '\x1b'}
 
 def fix_bp_attributes(bp):
     if 'line' not in bp or 'file' not in bp:
@@ -172,7 +273,356 @@ def fix_bp_attributes(bp):
             elif 'func' not in bp:
                 bp['func'] = oloc
 
-def eval_mi_result(line, eol_strip, re_remove):
+def is_breakpoint(bp):
+    """Return True when 'bp' is a breakpoint or a watchpoint."""
+    # The secondary breakpoints of a multiple breakpoint do not have a
+    # type.
+    return ('type' in bp and (('breakpoint' in bp['type']
+            # Exclude 'throw' and 'catch 'catchpoints (they are typed by
+            # gdb as 'breakpoint' instead of 'catchpoint').
+            and not
+                ('what' in bp and 'exception' in bp['what'])) or
+            'watchpoint' in bp['type']))
+
+def unescape_char(matchobj):
+    """Return the text of a c-string escape sequence.
+
+    The bytes of a sequence of octal escapes are decoded as UTF-8.
+
+    """
+    octal = matchobj.group(1)
+    if octal is None:
+        esc = matchobj.group(2)
+        return MI_ESCAPES.get(esc, esc)
+    data = bytearray(int(x, 8) & 0xff for x in octal[1:].split('\\'))
+    return data.decode('utf-8', 'replace')
+
+def parse_cstring(cstring):
+    r"""Return the content of a c-string without its escape sequences.
+
+    >>> parse_cstring(r'a \"b\" \\ c\tz') == 'a "b" \\ c\tz'
+    True
+    >>> parse_cstring(r'\303\251') == '\xe9'
+    True
+    >>> parse_cstring(r'\351t\351') == '\ufffdt\ufffd'
+    True
+
+    """
+    if '\\' not in cstring:
+        return cstring
+    return re_mi_escape.sub(unescape_char, cstring)
+
+def parse_stream_record(line):
+    r"""Return the text of a '~', '@' or '&' stream record, None on a bad
+    format.
+
+    >>> parse_stream_record(r'~"12:\tint foo(int);\n"') == \
+    ...                                             '12:\tint foo(int);\n'
+    True
+    >>> text = parse_stream_record(r'~"caf\303\251 \"\\n\" \\t\n"')
+    >>> text == 'caf\xe9 "\\n" \\t\n'
+    True
+    >>> parse_stream_record('~"foo') is None
+    True
+
+    """
+    if len(line) < 3 or line[1] != '"' or line[-1] != '"':
+        return None
+    text = line[2:-1]
+    if '\\' not in text:
+        return text
+    # Without an escaped backslash, each backslash starts an escape sequence
+    # and the usual ones may be replaced in any order.
+    if '\\\\' not in text:
+        simple = text.replace('\\n', '\n').replace('\\t', '\t').replace(
+                                                                '\\"', '"')
+        if '\\' not in simple:
+            return simple
+    return re_mi_escape.sub(unescape_char, text)
+
+def parse_mi(text):
+    r"""Parse a gdb/mi text in a single pass and return its value.
+
+    A tuple is returned as a dict (or a list when it contains values instead
+    of results), a list as a list and a c-string as a str. The variable
+    names of the results in a list are dropped. A sequence of results is
+    returned as a dict and a sequence of values as a tuple. Return None on a
+    syntax error.
+
+    >>> parse_mi('stack=[frame={level="0",func="main"},frame={level="1"}]')
+    {'stack': [{'level': '0', 'func': 'main'}, {'level': '1'}]}
+    >>> parse_mi('[child={name="var1.x",value="a=1, \\"b\\""}]')
+    [{'name': 'var1.x', 'value': 'a=1, "b"'}]
+    >>> parse_mi('{number="1",addr="<MULTIPLE>"},{number="1.1"}')
+    ({'number': '1', 'addr': '<MULTIPLE>'}, {'number': '1.1'})
+    >>> parse_mi('script={"silent","bt"},thread-groups=[]')
+    {'script': ['silent', 'bt'], 'thread-groups': []}
+    >>> parse_mi(r'{file="caf\303\251.c"}') == {'file': 'caf\xe9.c'}
+    True
+    >>> print(parse_mi('[{name="x"}'))
+    None
+
+    """
+    if not text:
+        return None
+    # Peek at the first character to know whether the sequence holds values
+    # or results.
+    top = {} if text[0] not in '"{[' else []
+    stack = [top]
+    name = None
+    for matchobj in re_mi_token.finditer(text):
+        group = matchobj.lastindex
+        if group == 2:
+            name = matchobj.group(2)
+            continue
+        if group == 1:
+            value = matchobj.group(1)
+            if '\\' in value:
+                value = re_mi_escape.sub(unescape_char, value)
+        else:
+            bracket = matchobj.group(3)
+            if bracket == '}' or bracket == ']':
+                stack.pop()
+                if not stack:
+                    return None
+                top = stack[-1]
+                name = None
+                continue
+            if bracket == '[':
+                value = []
+            else:
+                end = matchobj.end()
+                value = [] if text[end:end+1] in ('"', '{', '[') else {}
+
+        if isinstance(top, list):
+            top.append(value)
+        elif name is None:
+            return None
+        else:
+            top[name] = value
+        name = None
+        if group == 3:
+            stack.append(value)
+            top = value
+
+    if len(stack) != 1:
+        return None
+    top = stack[0]
+    if isinstance(top, list):
+        if not top:
+            return None
+        return top[0] if len(top) == 1 else tuple(top)
+    return top
+
+def match_brackets(text):
+    """Return the offsets of the brackets in a gdb/mi text.
+
+    The dictionary maps the offset of each opening bracket to the offset that
+    follows its closing bracket. Raise ValueError when the brackets are not
+    balanced.
+
+    """
+    ends = {}
+    stack = []
+    match = re_mi_bracket.match
+    pos = 0
+    while True:
+        # The text is matched from the last bracket, a failed search would
+        # be quadratic.
+        matchobj = match(text, pos)
+        if matchobj is None:
+            break
+        pos = matchobj.end()
+        char = text[pos-1]
+        if char == '{' or char == '[':
+            stack.append(pos - 1)
+            continue
+        if not stack:
+            raise ValueError('unbalanced bracket in gdb/mi text')
+        start = stack.pop()
+        if text[start] + char not in ('{}', '[]'):
+            raise ValueError('mismatched brackets in gdb/mi text')
+        ends[start] = pos
+    if stack:
+        raise ValueError('unbalanced bracket in gdb/mi text')
+    return ends
+
+def index_mi(text, start, end, ends):
+    """Return the (name, start, end) tuples of the members in text[start:end].
+
+    Only the members at the top level are scanned, the nested tuples and
+    lists are skipped with the 'ends' offsets built by match_brackets(). The
+    name of a member is empty when it is a value.
+
+    """
+    members = []
+    search = re_mi_scan.search
+    last = pos = start
+    while True:
+        matchobj = search(text, pos, end)
+        if matchobj is None:
+            break
+        vstart = matchobj.start()
+        pos = matchobj.end() if text[vstart] == '"' else ends[vstart]
+        members.append((text[last:vstart].lstrip(',').rstrip('='),
+                        vstart, pos))
+        last = pos
+    return members
+
+def mi_value(text, start, end, ends):
+    """Return the value in text[start:end], a str or a lazy view."""
+    char = text[start]
+    if char == '"':
+        return parse_cstring(text[start+1:end-1])
+    if char == '[' or text[start+1] in ('"', '{', '['):
+        return MiList(text, start + 1, end - 1, ends)
+    return MiTuple(text, start + 1, end - 1, ends)
+
+def mi_view(text):
+    r"""Return a lazy view on a gdb/mi text.
+
+    The brackets of the text are matched in a single pass and the values are
+    parsed when they are read, see parse_mi() for the mapping of the gdb/mi
+    values. A tuple is returned as a MiTuple and a list as a MiList. Return
+    None on a syntax error.
+
+    >>> text = ('threads=[{id="1",frame={level="0",func="main",'
+    ...         'args=[{name="argc",value="1"}]}}],current-thread-id="1"')
+    >>> record = mi_view(text)
+    >>> list(record)
+    ['threads', 'current-thread-id']
+    >>> frame = record['threads'][0]['frame']
+    >>> frame['func'], 'args' in frame, len(frame)
+    ('main', True, 3)
+    >>> record == parse_mi(text)
+    True
+    >>> print(mi_view('[{name="x"}'))
+    None
+
+    """
+    if not text:
+        return None
+    try:
+        ends = match_brackets(text)
+        members = index_mi(text, 0, len(text), ends)
+    except (ValueError, KeyError):
+        return None
+    if text[0] not in ('"', '{', '['):
+        return MiTuple(text, 0, len(text), ends, members)
+    if len(members) == 1:
+        return mi_value(text, members[0][1], members[0][2], ends)
+    return MiList(text, 0, len(text), ends, members)
+
+class MiTuple(Mapping):
+    """A read-only dictionary view on a gdb/mi tuple or sequence of results.
+
+    The members are indexed on first access and each value is parsed when
+    it is read.
+
+    """
+
+    def __init__(self, text, start, end, ends, members=None):
+        self.text = text
+        self.start = start
+        self.end = end
+        self.ends = ends
+        self.members = None
+        if members is not None:
+            self.members = OrderedDict((x[0], x[1:]) for x in members)
+        self.values_cache = {}
+
+    def get_members(self):
+        if self.members is None:
+            self.members = OrderedDict((x[0], x[1:]) for x in
+                        index_mi(self.text, self.start, self.end, self.ends))
+        return self.members
+
+    def __getitem__(self, name):
+        try:
+            return self.values_cache[name]
+        except KeyError:
+            start, end = self.get_members()[name]
+            value = mi_value(self.text, start, end, self.ends)
+            self.values_cache[name] = value
+            return value
+
+    def __contains__(self, name):
+        return name in self.get_members()
+
+    def select(self, names):
+        """Return a dictionary of the members whose name is in 'names'."""
+        text, ends = self.text, self.ends
+        return dict((name, mi_value(text, start, end, ends)) for
+                    name, (start, end) in self.get_members().items() if
+                    name in names)
+
+    def __iter__(self):
+        return iter(self.get_members())
+
+    def __len__(self):
+        return len(self.get_members())
+
+    def __repr__(self):
+        return 'MiTuple(%r)' % self.text[self.start:self.end]
+
+class MiList(Sequence):
+    """A read-only list view on a gdb/mi list or sequence of values.
+
+    The variable names of the results in the list are dropped.
+
+    """
+
+    def __init__(self, text, start, end, ends, members=None):
+        self.text = text
+        self.start = start
+        self.end = end
+        self.ends = ends
+        self.members = None
+        if members is not None:
+            self.members = [x[1:] for x in members]
+        self.values_cache = {}
+
+    def get_members(self):
+        if self.members is None:
+            self.members = [x[1:] for x in
+                        index_mi(self.text, self.start, self.end, self.ends)]
+        return self.members
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        try:
+            return self.values_cache[idx]
+        except KeyError:
+            start, end = self.get_members()[idx]
+            value = mi_value(self.text, start, end, self.ends)
+            self.values_cache[idx] = value
+            return value
+
+    def __len__(self):
+        return len(self.get_members())
+
+    def __eq__(self, other):
+        if not isinstance(other, (Sequence, list)):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'MiList(%r)' % self.text[self.start:self.end]
+
+def eval_mi_result(line, eol_strip, lazy=False):
+    """Parse the gdb/mi 'line' after removing 'eol_strip' at its end.
+
+    When 'lazy' is True, the result is a lazy view built by mi_view() and a
+    list is returned as a list of lazy views.
+
+    """
     if eol_strip:
         idx = line.rfind(eol_strip)
         if idx != -1:
@@ -183,19 +633,48 @@ def eval_mi_result(line, eol_strip, re_remove):
         else:
             error('cannot find "%s" in "%s"', eol_strip, line)
             return None
-    if re_remove:
-        line = re.sub(re_remove, '', line)
+    if lazy:
+        value = mi_view(line)
+        return list(value) if isinstance(value, MiList) else value
+    return parse_mi(line)
 
-    line = re.sub(re_evalkey, r'"\1":', line)
-    try:
-        return eval(line, {}, {})
-    except SyntaxError:
-        return None
+# dict keeps the insertion order since Python 3.7 and is smaller than OrderedDict
+VarObjDict = dict if PY37 else OrderedDict
+
+class VarObjList(VarObjDict):
+    """A dictionary of {name:VarObj instance}.
+
+    Instance attributes:
+        tab: tuple
+            the widths of the name, type and exp columns, None when they must
+            be computed again after the deletion of a varobj
+
+    """
+
+    __slots__ = ('tab',)
 
-class VarObjList(OrderedDict):
-    """A dictionary of {name:VarObj instance}."""
+    def __init__(self, *args, **kwds):
+        self.tab = (0, 0, 0)
+        VarObjDict.__init__(self, *args, **kwds)
 
-    def collect(self, parents, lnum, stream, indent=0):
+    def __setitem__(self, name, varobj, *args):
+        if name in self:
+            self.tab = None
+        VarObjDict.__setitem__(self, name, varobj, *args)
+        if self.tab is not None:
+            self.tab = (max(self.tab[0], len(varobj['name'])),
+                        max(self.tab[1], len(varobj['type'])),
+                        max(self.tab[2], len(varobj['exp'])))
+
+    def __delitem__(self, name, *args):
+        VarObjDict.__delitem__(self, name, *args)
+        self.tab = None
+
+    def clear(self):
+        VarObjDict.clear(self)
+        self.tab = (0, 0, 0)
+
+    def collect(self, parents, more, lnum, lines, indent=0):
         """Collect all varobj children data.
 
         Return True when the Variables buffer must be set as dirty
@@ -206,15 +685,15 @@ class VarObjList(OrderedDict):
             return False
 
         # follow positional parameters in VAROBJ_FMT
-        table = [(len(x['name']), len(x['type']), len(x['exp']))
-                                            for x in self.values()]
-        tab = (max([x[0] for x in table]),
-                        max([x[1] for x in table]),
-                        max([x[2] for x in table]))
+        if self.tab is None:
+            self.tab = (max(len(x['name']) for x in self.values()),
+                        max(len(x['type']) for x in self.values()),
+                        max(len(x['exp']) for x in self.values()))
 
         dirty = False
-        for name in self.keys():
-            status = self[name].collect(parents, lnum, stream, indent, tab)
+        for varobj in self.values():
+            status = varobj.collect(parents, more, lnum, lines, indent,
+                                    self.tab)
             if status:
                 dirty = True
         return dirty
@@ -225,8 +704,14 @@ class RootVarObj(object):
     Instance attributes:
         root: VarObjList
             the root of all varobj objects
+        index: dict
+            dictionary {name:(VarObj, VarObjList of the parent)} of all the
+            varobj objects
         parents: dict
             dictionary {lnum:varobj parent}
+        more: dict
+            dictionary {lnum:varobj parent} of the lines that load the next
+            children of a varobj
         dirty: boolean
             True when there is a change in the varobj objects
         str_content: str
@@ -236,7 +721,9 @@ class RootVarObj(object):
 
     def __init__(self):
         self.root = VarObjList()
+        self.index = {}
         self.parents = {}
+        self.more = {}
         self.dirty = False
         self.str_content = ''
 
@@ -250,7 +737,9 @@ class RootVarObj(object):
             self.dirty = False
         else:
             self.root.clear()
+            self.index = {}
             self.parents = {}
+            self.more = {}
             self.dirty = True
             self.str_content = ''
 
@@ -260,91 +749,190 @@ class RootVarObj(object):
         'childname' is a string with format: varNNN.child_1.child_2....
 
         """
-        branch = childname.split('.')
-        l = len(branch)
-        assert l
-        curlist = self.root
         try:
-            for i in range(l):
-                name = '.'.join(branch[:i+1])
-                if i == l - 1:
-                    return (curlist[name], curlist)
-                curlist = curlist[name]['children']
+            return self.index[childname]
         except KeyError:
-            warning('bad key: "%s", cannot find "%s" varobj'
-                                                % (name, childname))
+            warning('cannot find "%s" varobj' % childname)
         return (None, None)
 
+    def add(self, varlist, varobj):
+        """Add 'varobj' to 'varlist', the VarObjList of its parent."""
+        varlist[varobj['name']] = varobj
+        self.index[varobj['name']] = (varobj, varlist)
+
+    def delete(self, name):
+        """Delete the 'name' varobj and its children.
+
+        Return False when the varobj does not exist.
+
+        """
+        varobj, varlist = self.leaf(name)
+        if varlist is None:
+            return False
+        del varlist[name]
+        varobjs = [varobj]
+        while varobjs:
+            varobj = varobjs.pop()
+            del self.index[varobj['name']]
+            if varobj.children:
+                varobjs.extend(varobj.children.values())
+        return True
+
     def collect(self):
         """Return the string representation of the varobj objects.
 
-        This method has the side-effect of building the parents dictionary.
+        This method has the side-effect of building the parents and more
+        dictionaries.
 
         """
         if self.dirty:
             self.dirty = False
             self.parents = {}
+            self.more = {}
             lnum = [0]
-            output = io.StringIO()
-            self.dirty = self.root.collect(self.parents, lnum, output)
-            self.str_content = output.getvalue()
-            output.close()
+            lines = []
+            self.dirty = self.root.collect(self.parents, self.more, lnum, lines)
+            self.str_content = ''.join(lines)
         return self.str_content
 
-class VarObj(dict):
-    """A gdb/mi varobj object."""
+class VarObj(object):
+    """A gdb/mi varobj object.
+
+    A VarObj is accessed as a dictionary whose keys are the keys of
+    VAROBJ_KEYS, setting another key raises KeyError. The other keys of a
+    gdb/mi varobj record are ignored by update() and logged once. Its slots
+    keep the memory footprint low when a varobj has many thousands of
+    children. The children are created on the first access to the 'children'
+    key.
+
+    Class attributes:
+        interned: dict
+            the values of the VAROBJ_INTERNED keys shared by all the varobjs
+        ignored: set
+            the keys of the gdb/mi varobj records that have been ignored
+
+    Instance attributes:
+        chged: boolean
+            True when the value has changed since the last collect
+        more: int
+            the number of children that have not been fetched yet, -1 when
+            this number is not known
+        line: str
+            the line of the varobj in the variables buffer
+        line_key: tuple
+            the attributes the line has been formatted with
+
+    """
+
+    __slots__ = ('name', 'exp', 'type', 'value', 'marker', 'in_scope',
+                 'numchild', 'dynamic', 'has_more', 'children', 'chged',
+                 'more', 'line', 'line_key')
+    interned = {}
+    ignored = set()
 
     def __init__(self, vardict={}):
-        self['name'] = ''
-        self['exp'] = ''
-        self['type'] = ''
-        self['value'] = ''
-        self['chged'] = '={=}'
-        self['in_scope'] = 'true'
-        self['numchild'] = '0'
-        self['dynamic'] = '0'
-        self['children'] = VarObjList()
+        self.name = ''
+        self.exp = ''
+        self.type = ''
+        self.value = ''
+        self.marker = '={=}'
+        self.in_scope = 'true'
+        self.numchild = '0'
+        self.dynamic = '0'
+        self.has_more = None
+        self.children = None
         self.chged = True
+        self.more = 0
+        self.line = ''
+        self.line_key = None
         self.update(vardict)
 
-    def collect(self, parents, lnum, stream, indent, tab):
-        """Collect varobj data."""
+    def __getitem__(self, key):
+        if key == 'children':
+            if self.children is None:
+                self.children = VarObjList()
+            return self.children
+        value = getattr(self, VAROBJ_KEYS[key])
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in VAROBJ_INTERNED:
+            value = self.interned.setdefault(value, value)
+        setattr(self, VAROBJ_KEYS[key], value)
+
+    def __contains__(self, key):
+        if key == 'children':
+            return True
+        return key in VAROBJ_KEYS and getattr(self, VAROBJ_KEYS[key]) is not None
+
+    def __repr__(self):
+        return repr(dict((key, self[key]) for key in VAROBJ_KEYS if key in self))
+
+    def update(self, vardict):
+        """Update the varobj with the items of the 'vardict' dictionary."""
+        for key in vardict:
+            if key in VAROBJ_KEYS:
+                self[key] = vardict[key]
+            elif key not in self.ignored:
+                self.ignored.add(key)
+                info('the "%s" attribute of a varobj is ignored', key)
+
+    def collect(self, parents, more, lnum, lines, indent, tab):
+        """Collect varobj data.
+
+        The line of the varobj is formatted again only when one of the
+        attributes it is built from has changed. The children are followed by
+        a line that loads the next ones when they have not all been fetched.
+
+        """
         dirty = False
-        is_dyn = self['dynamic'] != '0'
+        is_dyn = self.dynamic != '0'
         # -var-update list new children as 'dynamic' and without 'has_more' to
         # indicate that those children may have children.
-        has_children = ((is_dyn and ('has_more' not in self or
-                                     self['has_more'] != '0' or
-                                     self['children'])) or
-                        (not is_dyn and self['numchild'] != '0'))
+        has_children = ((is_dyn and (self.has_more is None or
+                                     self.has_more != '0' or
+                                     self.children)) or
+                        (not is_dyn and self.numchild != '0'))
 
         if self.chged:
-            self['chged'] = '={*}'
+            self.marker = '={*}'
             self.chged = False
             dirty = True
-        elif self['in_scope'] != 'true':
-            self['chged'] = '={-}'
+        elif self.in_scope != 'true':
+            self.marker = '={-}'
         else:
-            self['chged'] = '={=}'
+            self.marker = '={=}'
 
         lnum[0] += 1
         if has_children:
             parents[lnum[0]] = self
-            if self['children']:
+            if self.children:
                 fold = '(-) ' if is_dyn else '[-] '
             else:
                 fold = '(+) ' if is_dyn else '[+] '
         else:
             fold = ' *  '
 
-        if is_dyn:
-            format = DYN_VAROBJ_FMT % (tab[0], tab[2])
-        else:
-            format = VAROBJ_FMT % tab
-        stream.write(' ' * indent + fold + format % self)
-        if self['children']:
-            status = self['children'].collect(parents, lnum, stream, indent + 2)
+        key = (indent, fold, tab, self.marker, self.value, self.type)
+        if key != self.line_key:
+            if is_dyn:
+                format = DYN_VAROBJ_FMT % (tab[0], tab[2])
+            else:
+                format = VAROBJ_FMT % tab
+            self.line = ' ' * indent + fold + format % self
+            self.line_key = key
+        lines.append(self.line)
+        if self.children:
+            status = self.children.collect(parents, more, lnum, lines,
+                                           indent + 2)
             dirty = dirty or status
+            if self.more:
+                lnum[0] += 1
+                more[lnum[0]] = self
+                lines.append('%s  ... %smore children\n' % (' ' * indent,
+                            '%d ' % self.more if self.more > 0 else ''))
 
         return dirty
 
@@ -354,6 +942,154 @@ class LooseFrame(dict):
         return set(other) == set(self) and all(other[x] == self[x]
                for x in self if x not in ('line', 'addr'))
 
+def function_name(line):
+    """Return the function name of an 'info functions' declaration.
+
+    The name is the qualified name, including its template arguments, that
+    precedes the parameter list. Return None when there is none.
+
+    >>> function_name('12:\tstatic int foo_bar(int, char **);')
+    'foo_bar'
+    >>> function_name('13:\tvoid (*foo_handler(int))(int);')
+    'foo_handler'
+    >>> function_name('\tstd::vector<int, std::allocator<int> >'
+    ...                             '::push_back(int const&);')
+    'std::vector<int, std::allocator<int> >::push_back'
+    >>> function_name('\tvoid ns::Foo<int>::bar(int);')
+    'ns::Foo<int>::bar'
+    >>> function_name('\tint operator==(A const&, A const&);')
+    'operator=='
+    >>> function_name('\tbool A::operator()(int) const;')
+    'A::operator()'
+    >>> function_name('\tstatic void (anonymous namespace)::baz(void);')
+    '(anonymous namespace)::baz'
+    >>> function_name('File foo.c:') is None
+    True
+
+    """
+    start = 0
+    depth = 0
+    i = 0
+    length = len(line)
+    while i < length:
+        c = line[i]
+        if c == '<':
+            depth += 1
+        elif c == '>':
+            depth = max(depth - 1, 0)
+        elif c == 'o' and line.startswith('operator', i) and (
+                i == 0 or not (line[i-1].isalnum() or line[i-1] == '_')):
+            matchobj = re_operator.match(line, i)
+            if matchobj:
+                i = matchobj.end()
+                continue
+        elif depth:
+            pass
+        elif c == '(':
+            if line.startswith('(anonymous namespace)', i):
+                i += len('(anonymous namespace)')
+                continue
+            if line[i+1:].lstrip().startswith('*'):
+                # A parenthesized declarator.
+                start = i + 1
+            else:
+                name = line[start:i].strip().lstrip('*&')
+                return name or None
+        elif c.isspace() or c in '*&),':
+            start = i + 1
+        i += 1
+    return None
+
+class SymbolIndex(object):
+    """The index of the function names used to complete locations.
+
+    The index is built one page of the 'info functions' output at a time by
+    SymbolsCommand, while gdb is idle. It is ready when all the pages have
+    been fetched.
+
+    Instance attributes:
+        pages: list
+            the regular expressions of the pages not yet fetched
+        names: set
+            the function names of the pages fetched so far
+        sorted_names: list
+            the sorted function names, None until the index is ready
+        fetching: boolean
+            True while a page is being fetched
+
+    >>> index = SymbolIndex()
+    >>> index.pages = ['^f']
+    >>> index.add_page('^f', 'All functions matching regular expression "^f":'
+    ...     '\\n\\nFile foo.c:\\n12:\\tint foo(int);\\n'
+    ...     '\\tstatic void foo_bar(void (*)(int));\\n'
+    ...     '13:\\tvoid (*foo_handler(int))(int);\\n'
+    ...     '\\nNon-debugging symbols:\\n0x0000000000401030  fork@plt\\n')
+    >>> index.sorted_names
+    ['foo', 'foo_bar', 'foo_handler', 'fork@plt']
+    >>> index.complete('break fo', ['src/foo.c', 'bar.c'])
+    ['break foo', 'break foo.c', 'break foo_bar', 'break foo_handler', \
+'break fork@plt']
+    >>> index.complete('print fo')
+    >>> index.complete('break foo.c:')
+
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """Clear the index, the pages are fetched again."""
+        self.pages = list(SYMBOLS_PAGES)
+        self.names = set()
+        self.sorted_names = None
+        self.fetching = False
+
+    def add_page(self, page, output):
+        """Add the function names of an 'info functions' page."""
+        if page not in self.pages:
+            return
+        self.pages.remove(page)
+        for line in output.splitlines():
+            name = function_name(line)
+            if name is None:
+                matchobj = re_nondebug.match(line)
+                if matchobj:
+                    name = matchobj.group('name')
+            if name:
+                self.names.add(name)
+        if not self.pages:
+            self.sorted_names = sorted(self.names)
+            self.names = set()
+
+    def complete(self, line, files=()):
+        """Return the completions of a location command line.
+
+        Return None when the index is not ready or when the line is not a
+        location command whose last word is the prefix of a function name.
+
+        """
+        if self.sorted_names is None:
+            return None
+        words = line.split()
+        if (len(words) != 2 or line[-1].isspace() or
+                words[0] not in LOCATION_CMDS or
+                not re_location.match(words[1])):
+            return None
+
+        prefix = words[1]
+        names = self.sorted_names
+        matches = set()
+        for i in range(bisect.bisect_left(names, prefix), len(names)):
+            if not names[i].startswith(prefix):
+                break
+            matches.add(names[i])
+        for pathname in files:
+            name = os.path.basename(pathname)
+            if name.startswith(prefix):
+                matches.add(name)
+        head = line[:len(line) - len(prefix)]
+        return [head + name for name in sorted(matches)]
+
 class Info(object):
     """Container for the debuggee state information.
 
@@ -369,8 +1105,23 @@ class Info(object):
             list of breakpoints, result of a previous OobGdbCommand
         bp_dictionary: dict
             breakpoints dictionary, with bp number as key
+        bp_lines: dict
+            the lines of each breakpoint in the breakpoints buffer with the
+            breakpoint record they are built from, keyed by breakpoint number
+        bp_directories: list
+            the source directories of the full path names in bp_lines
+        bp_content: str
+            the content of the breakpoints buffer built from bp_lines
         bp_dirty: boolean
             True when the breakpoints have changed
+        bp_unplaced: set
+            numbers of the breakpoints whose sign has not been placed because
+            their source file was not found
+        bp_notifications: boolean
+            True when gdb sends the =breakpoint-* async records
+        bp_atomic: boolean
+            True while the sign updates of the =breakpoint-* async records
+            are batched in an atomic section
         cwd: list
             current working directory
         debuggee: list
@@ -385,18 +1136,39 @@ class Info(object):
             previous frame
         frame_prefix: str
             completion prefix for the 'frame' command
-        backtrace: dict
-            the backtrace
+        backtrace: list
+            the loaded frames of the backtrace
         backtrace_dirty: boolean
             True when the backtrace has changed
-        threads_list: list
-            list of the gdb representation of a thread
+        backtrace_size: int
+            the size of the loaded range of frames
+        depth: list
+            the backtrace depth, result of the StackDepth OobGdbCommand
+        backtrace_depth: int
+            the number of frames in the backtrace, at most BACKTRACE_DEPTH_MAX
+        threads_list: MiTuple
+            lazy view of the '-thread-info' result
         threads: dict
             the threads
         threads_dirty: boolean
             True when the threads have changed
+        threads_unknown: set or None
+            ids of the threads whose state is unknown, None when the whole
+            threads table is unknown
+        thread_notifications: boolean
+            True when gdb sends the thread async records
         sources: list
             list of gdb sources
+        sources_index: dict
+            the full path names of the gdb sources, keyed by their file name
+        stat_cache: dict
+            the existence of the path names that have been looked up since
+            the last stop, keyed by path name
+        completion: misc.CompletionTrie
+            the cache of the gdb completions, cleared when the symbols or the
+            selected frame change
+        symbols: SymbolIndex
+            the index of the function names, cleared when the symbols change
         varobj: RootVarObj
             root of the tree of varobj objects
         changelist: list
@@ -409,7 +1181,13 @@ class Info(object):
         self.args = []
         self.breakpoints = []
         self.bp_dictionary = {}
+        self.bp_lines = {}
+        self.bp_directories = []
+        self.bp_content = ''
+        self.bp_unplaced = set()
         self.bp_dirty = False
+        self.bp_notifications = False
+        self.bp_atomic = False
         self.cwd = []
         self.debuggee = []
         self.directories = ['$cdir', '$cwd']
@@ -418,12 +1196,21 @@ class Info(object):
         self.frame = {}
         self.prev_frame = {}
         self.frame_prefix = ''
-        self.backtrace = {}
+        self.backtrace = []
         self.backtrace_dirty = False
+        self.backtrace_size = BACKTRACE_CHUNK
+        self.depth = []
+        self.backtrace_depth = 0
         self.threads_list = []
         self.threads = {}
         self.threads_dirty = False
+        self.threads_unknown = None
+        self.thread_notifications = False
         self.sources = []
+        self.sources_index = {}
+        self.stat_cache = {}
+        self.completion = misc.CompletionTrie()
+        self.symbols = SymbolIndex()
         self.varobj = RootVarObj()
         self.changelist = []
         # _root_varobj is only used for pretty printing with Cdumprepr
@@ -437,6 +1224,28 @@ class Info(object):
             sources_oobcmd.notify(None, force=True)
         self.file = self._file
 
+    def update_sources(self, cmd=''):
+        """Build the index of the sources."""
+        index = {}
+        for source in self.sources:
+            if 'file' in source and 'fullname' in source:
+                fullnames = index.setdefault(source['file'], [])
+                if source['fullname'] not in fullnames:
+                    fullnames.append(source['fullname'])
+        self.sources_index = index
+        self.stat_cache = {}
+        # The full path names of the breakpoints may have changed.
+        self.bp_lines = {}
+
+    def path_exists(self, pathname):
+        """Return True when pathname exists, the result is cached until the
+        next stop."""
+        try:
+            return self.stat_cache[pathname]
+        except KeyError:
+            exists = self.stat_cache[pathname] = os.path.exists(pathname)
+            return exists
+
     def get_fullpath(self, name):
         """Get the full path name for the file named 'name' and return it.
 
@@ -446,7 +1255,7 @@ class Info(object):
 
         # An absolute path name.
         if os.path.isabs(name):
-            if os.path.exists(name):
+            if self.path_exists(name):
                 return name
             else:
                 # Strip off the directory part and continue.
@@ -458,124 +1267,263 @@ class Info(object):
         # Proceed with each directory in gdb source directories.
         for dirname in self.directories:
             if dirname == '$cdir':
-                pathname = get_pathname(name, self.file)
-                if pathname:
-                    return pathname
-                for source in self.sources:
-                    pathname = get_pathname(name, source)
-                    if pathname:
+                if self.file.get('file') == name:
+                    pathname = self.file.get('fullname')
+                    if pathname and self.path_exists(pathname):
+                        return pathname
+                for pathname in self.sources_index.get(name, ()):
+                    if self.path_exists(pathname):
                         return pathname
             elif dirname == '$cwd':
                 pathname = os.path.abspath(name)
-                if os.path.exists(pathname):
+                if self.path_exists(pathname):
                     return pathname
             else:
                 pathname = os.path.join(dirname, name)
-                if os.path.exists(pathname):
+                if self.path_exists(pathname):
                     return pathname
 
+    def format_breakpoint(self, num, bp, pathname):
+        """Return the lines of the breakpoint 'num' in the breakpoints buffer."""
+        line = (('%-4s' % num) +
+                (' %(type)-15s %(enabled)-3s %(times)-5s '
+                 '%(disp)-6s' % bp))
+        if 'watchpoint' in bp['type']:
+            if 'what' in bp:
+                line += bp['what']
+        else:
+            if 'func' in bp:
+                line += ' in %(func)s' % bp
+            if 'line' in bp and 'file' in bp:
+                lnum = bp['line']
+                fname = bp['file']
+                line += ' at %s:%s' % (os.path.basename(fname), lnum)
+                if pathname is not None:
+                    line += ' <%s>' % pathname
+        lines = [line]
+        cond = bp['cond'] if 'cond' in bp else ''
+        if cond:
+            lines.append('%-6s stop only if %s' % (' ', cond))
+        ignore = bp['ignore'] if 'ignore' in bp else ''
+        if ignore:
+            pl = 's' if ignore != '1' else ''
+            ignore = ignore + ' ' if ignore != '1' else ''
+            lines.append('%-6s ignore next %shit%s' % (' ', ignore, pl))
+        return lines
+
     def collect_breakpoints(self):
+        """Return the content of the breakpoints buffer.
+
+        Only the breakpoints whose gdb record has changed since the last call
+        are formatted again, and the content is built again only when one of
+        them has changed. The cache is cleared when the sources or the source
+        directories change, since the full path names depend on them.
+
+        """
         self.bp_dirty = False
-        lines = []
-        for num in sorted(self.bp_dictionary.keys()):
-            bp = self.bp_dictionary[num]
-            line = (('%-4s' % num) +
-                    (' %(type)-15s %(enabled)-3s %(times)-5s '
-                     '%(disp)-6s' % bp))
-            if 'watchpoint' in bp['type']:
-                if 'what' in bp:
-                    line += bp['what']
-            else:
-                if 'func' in bp:
-                    line += ' in %(func)s' % bp
-                if 'line' in bp and 'file' in bp:
-                    lnum = bp['line']
-                    fname = bp['file']
-                    line += ' at %s:%s' % (os.path.basename(fname), lnum)
-                    pathname = self.get_fullpath(fname)
-                    if pathname is not None:
-                        line += ' <%s>' % pathname
-            lines.append(line)
-            cond = bp['cond'] if 'cond' in bp else ''
-            if cond:
-                lines.append('%-6s stop only if %s' % (' ', cond))
-            ignore = bp['ignore'] if 'ignore' in bp else ''
-            if ignore:
-                pl = 's' if ignore != '1' else ''
-                ignore = ignore + ' ' if ignore != '1' else ''
-                lines.append('%-6s ignore next %shit%s' % (' ', ignore, pl))
+        if self.directories != self.bp_directories:
+            self.bp_directories = self.directories
+            self.bp_lines = {}
+        changed = len(self.bp_lines) != len(self.bp_dictionary)
+        bp_lines = {}
+        for num, bp in self.bp_dictionary.items():
+            cached = self.bp_lines.get(num)
+            if cached is not None and cached[0] is bp:
+                bp_lines[num] = cached
+                continue
+            pathname = None
+            if ('watchpoint' not in bp['type'] and
+                    'line' in bp and 'file' in bp):
+                pathname = self.get_fullpath(bp['file'])
+            bp_lines[num] = (bp, self.format_breakpoint(num, bp, pathname))
+            changed = True
+        self.bp_lines = bp_lines
+        if not changed:
+            return self.bp_content
 
+        lines = []
+        for num in sorted(bp_lines):
+            lines.extend(bp_lines[num][1])
         if lines:
             lines.insert(0, 'Num  Type            Enb Hit   Disp   What')
-            return '\n'.join(lines) + '\n'
+            self.bp_content = '\n'.join(lines) + '\n'
         else:
-            return ''
+            self.bp_content = ''
+        return self.bp_content
 
     def update_breakpoints(self, cmd=''):
         """Update the breakpoints."""
         # Build the breakpoints dictionary.
         bp_dictionary = {}
         for bp in self.breakpoints:
-            # The secondary breakpoints of a multiple breakpoint do not have a
-            # type.
-            if ('type' in bp and (('breakpoint' in bp['type']
-                    # Exclude 'throw' and 'catch 'catchpoints (they are typed by
-                    # gdb as 'breakpoint' instead of 'catchpoint').
-                    and not
-                        ('what' in bp and 'exception' in bp['what'])) or
-                    'watchpoint' in bp['type'])):
+            if is_breakpoint(bp):
                 bp_dictionary[int(bp['number'])] = bp
 
         nset = set(bp_dictionary.keys())
         oldset = set(self.bp_dictionary.keys())
-        # Update the state of common breakpoints.
-        for num in (nset & oldset):
-            bp = bp_dictionary[num]
-            old_bp = self.bp_dictionary[num]
-            if 'watchpoint' not in bp['type']:
-                fix_bp_attributes(bp)
-            state = bp['enabled']
-            if state != old_bp['enabled']:
-                self.bp_dirty = True
-                if ('watchpoint' not in bp['type'] and 'line' in old_bp and
-                        'file' in old_bp):
-                    enabled = (state == 'y')
-                    self.gdb.update_bp(num, not enabled)
-            if bp['times'] != old_bp['times']:
-                self.bp_dirty = True
-            cond = bp['cond'] if 'cond' in bp else ''
-            old_cond = old_bp['cond'] if 'cond' in old_bp else ''
-            if cond != old_cond:
+        # The signs are updated in one atomic section.
+        self.start_bp_atomic()
+        try:
+            # Update the state of common breakpoints.
+            for num in (nset & oldset):
+                bp = bp_dictionary[num]
+                old_bp = self.bp_dictionary[num]
+                self.change_bp(num, bp, old_bp)
+                # Keep the record of an unchanged breakpoint, its lines in
+                # the breakpoints buffer are cached with this record.
+                if bp == old_bp:
+                    bp_dictionary[num] = old_bp
+
+            # Delete signs for non-existent breakpoints.
+            for num in (oldset - nset):
+                self.remove_bp(num, self.bp_dictionary[num])
+
+            # Create signs for the new breakpoints.
+            for num in sorted(nset - oldset):
+                self.create_bp(num, bp_dictionary[num])
+        finally:
+            self.end_bp_atomic()
+
+        self.bp_dictionary = bp_dictionary
+
+        if (oldset - nset) or (nset - oldset):
+            self.bp_dirty = True
+
+    def start_bp_atomic(self):
+        """Start the atomic section of the breakpoint sign updates."""
+        if not self.bp_atomic:
+            self.bp_atomic = True
+            self.gdb.start_atomic()
+
+    def end_bp_atomic(self):
+        """End the atomic section of the breakpoint sign updates."""
+        if self.bp_atomic:
+            self.bp_atomic = False
+            self.gdb.end_atomic()
+
+    def breakpoint_notification(self, line):
+        """Update a breakpoint from a =breakpoint-* async record.
+
+        Gdb 7.4 and above send the =breakpoint-created, =breakpoint-modified
+        and =breakpoint-deleted async records. Once such a record has been
+        received, the breakpoints table is maintained from these records and
+        the Breakpoints oob command does not fetch the whole breakpoints list
+        anymore.
+
+        The sign updates of the records received until the end of the
+        command, or until gdb is idle, are sent in one atomic section.
+
+        """
+        self.bp_notifications = True
+        self.start_bp_atomic()
+        if line.startswith('=breakpoint-deleted,'):
+            matchobj = re_bpdeleted.match(line)
+            if not matchobj:
+                error('bad format: "%s"', line)
+                return
+            num = int(matchobj.group('id'))
+            if num in self.bp_dictionary:
+                self.remove_bp(num, self.bp_dictionary[num])
+                del self.bp_dictionary[num]
                 self.bp_dirty = True
-            ignore = bp['ignore'] if 'ignore' in bp else ''
-            old_ignore = old_bp['ignore'] if 'ignore' in old_bp else ''
-            if ignore != old_ignore:
+            return
+
+        idx = line.find('bkpt=')
+        parsed = None
+        if idx != -1:
+            parsed = eval_mi_result(line[idx + len('bkpt='):], '')
+        # Drop the locations of a multiple breakpoint.
+        if isinstance(parsed, tuple) and parsed:
+            parsed = parsed[0]
+        if not isinstance(parsed, dict) or 'number' not in parsed:
+            error('failed to eval "%s"', line)
+            return
+        if not is_breakpoint(parsed):
+            return
+        try:
+            num = int(parsed['number'])
+            if num in self.bp_dictionary:
+                self.change_bp(num, parsed, self.bp_dictionary[num])
+            else:
+                self.create_bp(num, parsed)
                 self.bp_dirty = True
+            self.bp_dictionary[num] = parsed
+        except (KeyError, ValueError):
+            error('bad format: %s', parsed)
 
-        # Delete signs for non-existent breakpoints.
-        for num in (oldset - nset):
-            bp = self.bp_dictionary[num]
-            if 'watchpoint' in bp['type']:
-                continue
-            if 'line' in bp and 'file' in bp:
-                self.gdb.delete_bp(num)
+    def change_bp(self, num, bp, old_bp):
+        """Update the state of a breakpoint.
 
-        # Create signs for the new breakpoints.
-        for num in sorted(nset - oldset):
-            bp = bp_dictionary[num]
-            if 'watchpoint' in bp['type']:
-                continue
+        The sign is moved when gdb has changed the location of the
+        breakpoint.
+
+        """
+        state = bp['enabled']
+        if 'watchpoint' not in bp['type']:
             fix_bp_attributes(bp)
-            if 'line' in bp and 'file' in bp:
-                pathname = self.get_fullpath(bp['file'])
-                if pathname is not None:
-                    lnum = int(bp['line'])
-                    self.gdb.add_bp(num, pathname, lnum)
+            if ((bp.get('file'), bp.get('line')) !=
+                    (old_bp.get('file'), old_bp.get('line'))):
+                self.bp_dirty = True
+                self.relocate_bp(num, bp, old_bp)
+            elif num in self.bp_unplaced:
+                # Retry to place the sign, the sources may have changed.
+                self.relocate_bp(num, bp, old_bp)
+            elif (state != old_bp['enabled'] and 'line' in old_bp and
+                    'file' in old_bp):
+                enabled = (state == 'y')
+                self.gdb.update_bp(num, not enabled)
+        if state != old_bp['enabled']:
+            self.bp_dirty = True
+        if bp['times'] != old_bp['times']:
+            self.bp_dirty = True
+        cond = bp['cond'] if 'cond' in bp else ''
+        old_cond = old_bp['cond'] if 'cond' in old_bp else ''
+        if cond != old_cond:
+            self.bp_dirty = True
+        ignore = bp['ignore'] if 'ignore' in bp else ''
+        old_ignore = old_bp['ignore'] if 'ignore' in old_bp else ''
+        if ignore != old_ignore:
+            self.bp_dirty = True
 
-        self.bp_dictionary = bp_dictionary
+    def relocate_bp(self, num, bp, old_bp):
+        """Move the sign of a breakpoint whose location has changed."""
+        pathname = None
+        if 'line' in bp and 'file' in bp:
+            pathname = self.get_fullpath(bp['file'])
+        if pathname is not None:
+            self.gdb.move_bp(num, pathname, int(bp['line']),
+                                            bp['enabled'] != 'y')
+            self.bp_unplaced.discard(num)
+            return
+        if ('line' in old_bp and 'file' in old_bp and
+                num not in self.bp_unplaced):
+            self.gdb.delete_bp(num)
+        if 'line' in bp and 'file' in bp:
+            self.bp_unplaced.add(num)
+        else:
+            self.bp_unplaced.discard(num)
 
-        if (oldset - nset) or (nset - oldset):
-            self.bp_dirty = True
+    def remove_bp(self, num, bp):
+        """Delete the sign of a breakpoint."""
+        if 'watchpoint' in bp['type']:
+            return
+        if num in self.bp_unplaced:
+            self.bp_unplaced.discard(num)
+        elif 'line' in bp and 'file' in bp:
+            self.gdb.delete_bp(num)
+
+    def create_bp(self, num, bp):
+        """Create the sign of a new breakpoint."""
+        if 'watchpoint' in bp['type']:
+            return
+        fix_bp_attributes(bp)
+        if 'line' in bp and 'file' in bp:
+            pathname = self.get_fullpath(bp['file'])
+            if pathname is not None:
+                lnum = int(bp['line'])
+                self.gdb.add_bp(num, pathname, lnum)
+            else:
+                self.bp_unplaced.add(num)
 
     def collect_backtrace(self):
         self.backtrace_dirty = False
@@ -602,17 +1550,49 @@ class Info(object):
                     line += ' <%s>' % pathname
             lines.append(line)
 
+        remain = self.backtrace_depth - len(self.backtrace)
+        if lines and remain > 0:
+            lines.append('  ... %s%d more frames' %
+                ('at least ' if self.backtrace_depth >= BACKTRACE_DEPTH_MAX
+                                                            else '', remain))
+
         if lines:
             return '\n'.join(lines) + '\n'
         else:
             return ''
 
+    def update_depth(self, cmd=''):
+        """Update the depth of the backtrace."""
+        depth = int(self.depth[0])
+        if depth != self.backtrace_depth:
+            self.backtrace_depth = depth
+            self.backtrace_dirty = True
+
+    def load_frames(self, level):
+        """Extend the loaded range of frames beyond 'level'."""
+        size = self.backtrace_size
+        if level >= size and not self.gdb.listbuffer_hidden('backtrace'):
+            self.backtrace_size = (level // BACKTRACE_CHUNK + 1) * BACKTRACE_CHUNK
+            ListFramesCommand(self.gdb, size, self.backtrace_size - 1).sendcmd()
+
+    def add_frames(self, frames):
+        """Append the frames that follow the last loaded one."""
+        for f in frames:
+            if int(f['level']) == len(self.backtrace):
+                self.backtrace.append(f)
+                self.backtrace_dirty = True
+
     def update_frame(self, cmd=''):
         """Update the frame sign."""
         self.frame = LooseFrame(self.frame)
         try:
+            # Cup or Cframe past the loaded range of frames.
+            if 'level' in self.frame:
+                self.load_frames(int(self.frame['level']))
             if self.prev_frame != self.frame:
                 self.backtrace_dirty = True
+                # The completions include the local variables.
+                self.completion.clear()
             if 'line' in self.frame:
                 f = self.frame
                 line = int(f['line'])
@@ -632,9 +1612,9 @@ class Info(object):
                         keys.remove('frame')
                         self.frame_prefix = misc.smallpref_inlist('frame',
                                                                    keys)
-                    if (self.prev_frame != self.frame or
-                                cmd.startswith(self.frame_prefix)):
-                        self.gdb.show_frame(pathname, line)
+                    frame_cmd = cmd.startswith(self.frame_prefix)
+                    if self.prev_frame != self.frame or frame_cmd:
+                        self.gdb.show_frame(pathname, line, setdot=frame_cmd)
                     return
 
             self.hide_frame()
@@ -645,7 +1625,9 @@ class Info(object):
         if self.prev_frame:
             self.prev_frame = {}
             self.backtrace_dirty = True
-            self.backtrace = {}
+            self.backtrace = []
+            self.backtrace_depth = 0
+        self.backtrace_size = BACKTRACE_CHUNK
         self.gdb.show_frame()
 
     def collect_threads(self):
@@ -674,37 +1656,37 @@ class Info(object):
         else:
             return ''
 
-    def update_threads(self, cmd=''):
+    def parse_threads(self, record):
+        """Return the threads dictionary and the current thread id.
+
+        'record' is the lazy view of a '-thread-info' result, only the
+        attributes displayed in the threads buffer are parsed.
+
+        """
         threads = {}
-        current = None
-        # Parse the threads_list and build a new threads dictionary.
-        for sthread, current in self.threads_list:
-            if not sthread:
-                continue
-            for sthread in misc.split_matches(sthread, ('{', '}')):
-                sframe = ''
-                lthread = sthread[1:-1].split('frame={', 1)
-                if len(lthread) == 2:
-                    remain = lthread[1].rsplit('}', 1)
-                    sthread = lthread[0].strip(' ,') + remain[1]
-                    sframe = remain[0]
-                else:
-                    sthread = lthread[0]
-                thread = misc.parse_keyval(re_threads_attributes, sthread)
-                if 'current' not in thread:
-                    thread['current'] = ' '
-                if sframe:
-                    if self.gdb.version >= [6, 4]:
-                        frame = misc.parse_keyval(re_frame, sframe)
-                    else:
-                        frame = misc.parse_keyval(re_framecli, sframe)
-                    thread['frame'] = LooseFrame(frame)
+        if not record:
+            return threads, None
+        for view in record.get('threads', ()):
+            thread = view.select(THREADS_ATTRIBUTES)
+            if 'current' not in thread:
+                thread['current'] = ' '
+            frame = view.get('frame')
+            if frame is not None:
+                thread['frame'] = self.parse_frame(frame)
 
-                try:
-                    threads[int(thread['id'])] = thread
-                except (ValueError, KeyError):
-                    error('invalid thread id %s', thread)
+            try:
+                threads[int(thread['id'])] = thread
+            except (ValueError, KeyError):
+                error('invalid thread id %s', thread)
+        return threads, record.get('current-thread-id')
+
+    def parse_frame(self, frame):
+        """Return the LooseFrame of the lazy view of a frame."""
+        return LooseFrame(frame.select(FRAME_ATTRIBUTES))
 
+    def update_threads(self, cmd=''):
+        # Parse the threads_list and build a new threads dictionary.
+        threads, current = self.parse_threads(self.threads_list)
         if current is not None:
             try:
                 threads[int(current)]['current'] = '*'
@@ -715,6 +1697,117 @@ class Info(object):
         if threads != self.threads:
             self.threads_dirty = True
         self.threads = threads
+        self.threads_unknown = set()
+
+    def update_thread(self, id, thread):
+        """Update the thread 'id' with the result of '-thread-info id'."""
+        old = self.threads.get(id)
+        if thread is None:
+            if old is not None:
+                del self.threads[id]
+                self.threads_dirty = True
+            return
+        thread['current'] = old['current'] if old is not None else ' '
+        if thread != old:
+            self.threads_dirty = True
+        self.threads[id] = thread
+
+    def set_threads_state(self, state):
+        """Set the state of all the threads of the threads table."""
+        for id, thread in list(self.threads.items()):
+            if thread.get('state') != state:
+                thread = dict(thread)
+                thread['state'] = state
+                self.update_thread(id, thread)
+
+    def set_current_thread(self, id):
+        """Mark the thread 'id' as the current thread."""
+        for tid, thread in self.threads.items():
+            current = '*' if tid == id else ' '
+            if thread['current'] != current:
+                thread['current'] = current
+                self.threads_dirty = True
+
+    def thread_notification(self, line):
+        """Update the threads table from a thread async record.
+
+        The =thread-created, =thread-exited and =thread-selected async records
+        and the 'thread-id' field of the *running and *stopped async records
+        are used to maintain the threads table. Only the threads whose state
+        becomes unknown, the ones that have been created or resumed alone,
+        are queried afterward by the Threads oob command.
+
+        When all the threads are resumed and stopped together, as in all-stop
+        mode, the thread that has stopped is updated with the frame of the
+        *stopped record and the frames of the other threads become unknown.
+
+        """
+        if line.startswith('=thread-group-'):
+            # A process has been started or has exited.
+            self.threads_unknown = None
+            return
+
+        unknown = self.threads_unknown
+        if line.startswith('=thread-'):
+            matchobj = re_threadevt.match(line)
+            if not matchobj:
+                return
+            self.thread_notifications = True
+            evt = matchobj.group('evt')
+            id = int(matchobj.group('id'))
+            if evt == 'created':
+                if unknown is not None:
+                    unknown.add(id)
+            elif evt == 'exited':
+                if self.threads.pop(id, None) is not None:
+                    self.threads_dirty = True
+                if unknown is not None:
+                    unknown.discard(id)
+            else:
+                self.set_current_thread(id)
+            return
+
+        matchobj = re_threadid.search(line)
+        if not matchobj:
+            return
+        self.thread_notifications = True
+        id = matchobj.group('id')
+        if line.startswith('*running,'):
+            if id == 'all':
+                if unknown is not None:
+                    self.set_threads_state('running')
+            elif unknown is not None:
+                unknown.add(int(id))
+            return
+
+        # A *stopped async record.
+        if id == 'all':
+            return
+        id = int(id)
+        self.set_current_thread(id)
+        if unknown is None:
+            return
+        matchobj = re_stoppedthreads.search(line)
+        if matchobj:
+            stopped = matchobj.group('threads')
+            if stopped == '"all"':
+                self.set_threads_state('stopped')
+                unknown.update(tid for tid in self.threads if tid != id)
+            else:
+                unknown.update(int(x) for x in re_threadids.findall(stopped))
+
+        # The frame of the thread that has stopped is in the record.
+        thread = self.threads.get(id)
+        if thread is not None:
+            record = mi_view(line[len('*stopped,'):])
+            if record and 'frame' in record:
+                thread = dict(thread)
+                thread['state'] = 'stopped'
+                thread['frame'] = self.parse_frame(record['frame'])
+                self.update_thread(id, thread)
+                unknown.discard(id)
+                return
+        unknown.add(id)
 
     def update_changelist(self, cmd):
         """Process a varobj changelist event."""
@@ -723,6 +1816,16 @@ class Info(object):
             if varobj is None:
                 continue
             varobj['in_scope'] = vardict['in_scope']
+            if vardict.get('type_changed') == 'true':
+                # Gdb has deleted the children of the varobj.
+                for name in list(varobj['children']):
+                    self.varobj.delete(name)
+                if 'new_type' in vardict:
+                    varobj['type'] = vardict['new_type']
+                if 'new_num_children' in vardict:
+                    varobj['numchild'] = vardict['new_num_children']
+                varobj.chged = True
+                varlist.tab = None
             if 'value' in vardict and varobj['value'] != vardict['value']:
                 varobj['value'] = vardict['value']
                 varobj.chged = True
@@ -732,6 +1835,8 @@ class Info(object):
                         varobj['has_more'] != vardict['has_more']):
                     varobj['has_more'] = vardict['has_more']
                     varobj.chged = True
+                if varobj.more:
+                    varobj.more = -1 if vardict['has_more'] != '0' else 0
 
             if 'new_num_children' in vardict:
                 new_num_children = int(vardict['new_num_children'])
@@ -740,13 +1845,12 @@ class Info(object):
                     if 'new_children' in vardict:
                         for child in (VarObj(x) for x in
                                       vardict['new_children']):
-                            varobj['children'][child['name']] = child
+                            self.varobj.add(varobj['children'], child)
                             varobj.chged = True
                 elif new < 0:
-                    for (i, name) in enumerate(varobj['children']):
-                        if i >= new_num_children:
-                            del varobj['children'][name]
-                            varobj.chged = True
+                    for name in list(varobj['children'])[new_num_children:]:
+                        self.varobj.delete(name)
+                        varobj.chged = True
 
         if self.changelist:
             self.varobj.dirty = True
@@ -763,12 +1867,12 @@ class Result(dict):
 
     Instance attributes:
         token: str
-            gdb/mi token number; range 100..199
+            gdb/mi token number; range TOKEN_MIN..TOKEN_MAX
 
     """
 
     def __init__(self):
-        self.token = 100
+        self.token = TOKEN_MIN
 
     def add(self, command):
         """Add a command object to the dictionary."""
@@ -783,7 +1887,9 @@ class Result(dict):
         if t in self:
             error('token "%s" already exists as an expected pending result', t)
         self[t] = command
-        self.token = (self.token + 1) % 100 + 100
+        self.token += 1
+        if self.token > TOKEN_MAX:
+            self.token = TOKEN_MIN
         return t
 
     def remove(self, token):
@@ -828,6 +1934,7 @@ class OobList(object):
             File(gdb),
             FrameCli(gdb),      # After File.
             Frame(gdb),
+            StackDepth(gdb),
             BackTrace(gdb),     # After Frame.
             Threads(gdb),
             PgmFile(gdb),
@@ -886,6 +1993,20 @@ class OobList(object):
         else:
             self.running_list.append(obj)
 
+    def must_wait(self):
+        """Return True when the next object of the iterator must wait for the
+        results of the gdb commands already sent.
+
+        This is the case when the fifo is empty, as VarObjCmd objects may still
+        be pushed while processing these results, and when the next object is
+        an OobCommand or a VarObjCmd depending on these results at the time it
+        is run.
+
+        """
+        if not self.fifo:
+            return True
+        return self.fifo[0].barrier
+
 class Command(object):
     """Abstract class to send gdb command and process the result.
 
@@ -950,7 +2071,13 @@ class CliCommandNoPrompt(CliCommand):
     pass
 
 class CompleteCommand(CliCommand):
-    """Get the gdb completion."""
+    """Get the gdb completion.
+
+    The completion is taken from the Info.completion cache or from the
+    Info.symbols index when possible, otherwise it is fetched from gdb and
+    added to the cache.
+
+    """
 
     def sendcmd(self, args):
         """Send the gdb command."""
@@ -964,25 +2091,75 @@ class CompleteCommand(CliCommand):
             idx = args.rfind(arglead[1])
             self.prefix = args[:idx]
 
-        if not CliCommand.sendcmd(self, 'complete %s' % args, verbose=False):
+        self.args = args
+        completions = self.gdb.info.completion.lookup(args)
+        if completions is None:
+            completions = self.gdb.info.symbols.complete(args,
+                                            self.gdb.info.sources_index)
+        if completions is not None:
+            self.write_completion(completions)
+        elif not CliCommand.sendcmd(self, 'complete %s' % args, verbose=False):
             with open(self.gdb.globaal.f_ack.name, 'w') as f:
                 f.write('Nok\n')
 
+    def write_completion(self, completions):
+        """Write the completions for s:GdbComplete()."""
+        plen = len(self.prefix)
+        completion = '\n'.join(l[plen:] for l in completions
+                               if l.find(self.prefix) == 0)
+
+        with open(self.gdb.globaal.f_clist.name, 'w') as f:
+            f.write(completion)
+
+        with open(self.gdb.globaal.f_ack.name, 'w') as f:
+            result = 'Ok\n' if completion else 'Nok\n'
+            f.write(result)
+
     def handle_result(self, result):
         if result == 'done':
-            plen = len(self.prefix)
-            completion = '\n'.join(l[plen:]
-                                   for l in self.stream_record.splitlines()
-                                   if l.find(self.prefix) == 0)
+            completions = self.stream_record.splitlines()
+            complete = not (completions and
+                            TRUNCATED_COMPLETION in completions[-1])
+            self.gdb.info.completion.insert(self.args, completions, complete)
+            self.write_completion(completions)
 
-            with open(self.gdb.globaal.f_clist.name, 'w') as f:
-                f.write(completion)
+    def handle_strrecord(self, stream_record):
+        self.stream_record += stream_record
 
-            with open(self.gdb.globaal.f_ack.name, 'w') as f:
-                result = 'Ok\n' if completion else 'Nok\n'
-                f.write(result)
+class SymbolsCommand(Command):
+    """Fetch the next page of the Info.symbols index.
+
+    The command does not set gdb busy and its result does not run the oob
+    commands, so a user command is sent at once while the page is being
+    fetched and gdb processes it next. A page that fails is dropped.
+
+    Instance attributes:
+        page: str
+            the regular expression of the page
+
+    """
+
+    def sendcmd(self):
+        """Send the gdb command."""
+        symbols = self.gdb.info.symbols
+        self.page = symbols.pages[0]
+        if self.send('-interpreter-exec console %s\n',
+                     misc.quote('info functions %s' % self.page)):
+            symbols.fetching = True
+            return True
+        return False
+
+    def handle_result(self, result):
+        """Process gdb/mi result."""
+        symbols = self.gdb.info.symbols
+        symbols.fetching = False
+        if result == 'done':
+            symbols.add_page(self.page, self.stream_record)
+        else:
+            symbols.add_page(self.page, '')
 
     def handle_strrecord(self, stream_record):
+        """Process the stream records output by the command."""
         self.stream_record += stream_record
 
 class MiCommand(Command):
@@ -1019,30 +2196,67 @@ class MiCommand(Command):
         if not self.result and stream_record:
             self.gdb.console_print(stream_record)
 
+def create_varobj(cmd, line):
+    """Add the varobj of a VarCreateCommand or VarObjCmdCreate 'cmd'."""
+    parsed = misc.parse_keyval(re_varcreate, line)
+    if REQ_VARCREATE_ATTRIBUTES.issubset(parsed):
+        rootvarobj = cmd.gdb.info.varobj
+        varobj = cmd.varobj
+        varobj.update(parsed)
+        try:
+            rootvarobj.add(rootvarobj.root, varobj)
+            rootvarobj.dirty = True
+            cmd.result = line
+        except KeyError:
+            error('in varobj creation of %s', str(parsed))
+
 class VarCreateCommand(MiCommand):
-    """Create a variable object."""
+    """Create a variable object.
+
+    Class attributes:
+        varnum: int
+            the number of the name of the next new varobj
+        released: list
+            the numbers of the names given back by the VarObjCmdCreate commands
+            that have failed, they are used first
+
+    """
 
     varnum = 1
+    released = []
+
+    @staticmethod
+    def next_varnum():
+        """Return the number of the name of the next varobj."""
+        if VarCreateCommand.released:
+            return min(VarCreateCommand.released)
+        return VarCreateCommand.varnum
+
+    @staticmethod
+    def reserve_varnum():
+        """Reserve the number of the name of the next varobj and return it."""
+        num = VarCreateCommand.next_varnum()
+        if num in VarCreateCommand.released:
+            VarCreateCommand.released.remove(num)
+        else:
+            VarCreateCommand.varnum += 1
+        return num
+
+    @staticmethod
+    def release_varnum(num):
+        """Give back the number of the name of a varobj not created."""
+        VarCreateCommand.released.append(num)
 
     def sendcmd(self):
         """Send the gdb command."""
         return MiCommand.docmd(self, '-var-create var%d * %s\n',
-                               self.varnum, misc.quote(self.varobj['exp']))
+                    VarCreateCommand.next_varnum(),
+                    misc.quote(self.varobj['exp']))
 
     def handle_result(self, line):
         """Process gdb/mi result."""
-        VarCreateCommand.varnum += 1
-        parsed = misc.parse_keyval(re_varcreate, line)
-        if REQ_VARCREATE_ATTRIBUTES.issubset(parsed):
-            rootvarobj = self.gdb.info.varobj
-            varobj = self.varobj
-            varobj.update(parsed)
-            try:
-                rootvarobj.root[varobj['name']] = varobj
-                rootvarobj.dirty = True
-                self.result = line
-            except KeyError:
-                error('in varobj creation of %s', str(parsed))
+        VarCreateCommand.reserve_varnum()
+        create_varobj(self, line)
 
 class VarDeleteCommand(MiCommand):
     """Delete the variable object and its children."""
@@ -1058,11 +2272,8 @@ class VarDeleteCommand(MiCommand):
         if matchobj:
             self.result = matchobj.group('ndeleted')
             if self.result:
-                name = self.varobj['name']
                 rootvarobj = self.gdb.info.varobj
-                (varobj, varlist) = rootvarobj.leaf(name)
-                if varlist is not None:
-                    del varlist[name]
+                if rootvarobj.delete(self.varobj['name']):
                     rootvarobj.dirty = True
                     self.gdb.console_print(
                                 '%s watched variables have been deleted\n',
@@ -1084,14 +2295,22 @@ class VarSetFormatCommand(MiCommand):
                         self.varobj['name'], matchobj.group('value'))
 
 class ListChildrenCommand(MiCommand):
-    """Return a list of the object's children."""
+    """Return a list of the object's children.
+
+    The children are fetched by chunks of CHILDREN_CHUNK children, all of
+    them are fetched at once before gdb 7.0.
+
+    """
     prefix = 'children='
-    remove = re.compile('child=(?={)')
 
-    def sendcmd(self):
-        """Send the gdb command."""
-        return MiCommand.docmd(self, '-var-list-children --all-values %s\n',
-                                                        self.varobj['name'])
+    def sendcmd(self, start=0):
+        """Send the gdb command to fetch the children from index 'start'."""
+        if self.gdb.version < [7]:
+            return MiCommand.docmd(self,
+                    '-var-list-children --all-values %s\n', self.varobj['name'])
+        return MiCommand.docmd(self,
+                    '-var-list-children --all-values %s %d %d\n',
+                    self.varobj['name'], start, start + CHILDREN_CHUNK)
 
     def handle_result(self, line):
         """Process gdb/mi result."""
@@ -1103,16 +2322,26 @@ class ListChildrenCommand(MiCommand):
         if end == -1:
             error('cannot find "]" in %s', line)
             return
+        matchobj = re_hasmore.search(line, end)
         if end != len(line) - 1:
             line = line[:end+1]
-        varlist = eval_mi_result(line, '', self.remove)
+        varlist = eval_mi_result(line, '')
         if not varlist:
             if varlist is None:
                 error('failed to eval "%s"', line)
             return
+        rootvarobj = self.gdb.info.varobj
+        children = self.varobj['children']
         for varobj in (VarObj(x) for x in varlist):
-            self.varobj['children'][varobj['name']] = varobj
-        self.gdb.info.varobj.dirty = True
+            rootvarobj.add(children, varobj)
+        if self.varobj['dynamic'] != '0':
+            # The number of children of a pretty printer is not known.
+            self.varobj.more = (-1 if matchobj and
+                                matchobj.group('has_more') != '0' else 0)
+        else:
+            self.varobj.more = max(0,
+                                   int(self.varobj['numchild']) - len(children))
+        rootvarobj.dirty = True
 
 class ShowBalloon(Command):
     """The ShowBalloon command.
@@ -1154,9 +2383,89 @@ class ShowBalloon(Command):
         if not self.result and stream_record:
             self.gdb.show_balloon(stream_record)
 
+class ListFramesCommand(Command):
+    """Get the frames of the backtrace in a range of levels.
+
+    Instance attributes:
+        gdb: Gdb
+            the Gdb instance
+        low: int
+            the level of the first frame
+        high: int
+            the level of the last frame
+
+    """
+
+    prefix = 'stack='
+
+    def __init__(self, gdb, low, high):
+        Command.__init__(self, gdb)
+        self.low = low
+        self.high = high
+
+    def sendcmd(self):
+        """Send the gdb command."""
+        return self.send('-stack-list-frames %d %d\n', self.low, self.high)
+
+    def handle_result(self, line):
+        """Process gdb/mi result."""
+        start = line.find(self.prefix)
+        if start == -1:
+            return
+        frames = eval_mi_result(line[start + len(self.prefix):], '', True)
+        if frames is None:
+            error('failed to eval "%s"', line)
+        elif frames:
+            self.gdb.info.add_frames(frames)
+
+    def handle_strrecord(self, stream_record):
+        """Process the gdb/mi stream records."""
+        pass
+
+class ThreadInfoCommand(Command):
+    """Get the information of one thread.
+
+    Instance attributes:
+        gdb: Gdb
+            the Gdb instance
+        id: int
+            the thread id
+
+    """
+
+    def __init__(self, gdb, id):
+        Command.__init__(self, gdb)
+        self.id = id
+
+    def sendcmd(self):
+        """Send the gdb command."""
+        return self.send('-thread-info %d\n', self.id)
+
+    def handle_result(self, line):
+        """Process gdb/mi result."""
+        # An error result means that the thread does not exist anymore.
+        threads = {}
+        current = None
+        idx = line.find('done,')
+        if idx != -1:
+            record = mi_view(line[idx + len('done,'):])
+            threads, current = self.gdb.info.parse_threads(record)
+        self.gdb.info.update_thread(self.id, threads.get(self.id))
+        if current is not None:
+            self.gdb.info.set_current_thread(int(current))
+
+    def handle_strrecord(self, stream_record):
+        """Process the gdb/mi stream records."""
+        pass
+
 class VarObjCmd(Command):
     """The VarObjCmd abstract class.
 
+    Class attributes:
+        barrier: boolean
+            when True, the VarObjCmd is run only after the results of all the
+            previous commands have been processed
+
     Instance attributes:
         gdb: Gdb
             the Gdb instance
@@ -1168,6 +2477,7 @@ class VarObjCmd(Command):
     """
 
     __metaclass__ = ABCMeta
+    barrier = False
 
     def __init__(self, gdb, varobj):
         self.gdb = gdb
@@ -1195,6 +2505,47 @@ class VarObjCmd(Command):
         """
         return self.sendcmd()
 
+class VarObjCmdCreate(VarObjCmd):
+    """The VarObjCmdCreate class.
+
+    Create one of the variable objects of a Cdbgvar command with several
+    expressions. The commands are pipelined, the name of the varobj is
+    reserved when the command is sent and given back when gdb fails to
+    create it.
+
+    Instance attributes:
+        varnum: int
+            the number of the name of the varobj
+
+    """
+
+    def sendcmd(self):
+        """Send the gdb command.
+
+        Return True when the command has been sent to gdb, False otherwise.
+
+        """
+        self.result = ''
+        self.varnum = VarCreateCommand.reserve_varnum()
+        sent = self.send('-var-create var%d * %s\n', self.varnum,
+                                            misc.quote(self.varobj['exp']))
+        if not sent:
+            VarCreateCommand.release_varnum(self.varnum)
+        return sent
+
+    def handle_result(self, line):
+        """Process gdb/mi result."""
+        errmsg = 'error,msg='
+        if line.startswith(errmsg):
+            VarCreateCommand.release_varnum(self.varnum)
+            line = line[len(errmsg):]
+            matchobj = misc.re_quoted.match(line)
+            if matchobj:
+                line = misc.unquote(matchobj.group(1))
+            self.gdb.console_print('%s: %s\n', self.varobj['exp'], line)
+        else:
+            create_varobj(self, line)
+
 class VarObjCmdEvaluate(VarObjCmd):
     """The VarObjCmdEvaluate class."""
 
@@ -1221,6 +2572,35 @@ class VarObjCmdEvaluate(VarObjCmd):
                 self.gdb.info.varobj.dirty = True
                 self.varobj['value'] = value
 
+class VarObjCmdUpdateRange(VarObjCmd):
+    """The VarObjCmdUpdateRange class.
+
+    Restrict the children of a dynamic varobj reported by '-var-update' to
+    the children that have been fetched. The command waits for the result of
+    the ListChildrenCommand.
+
+    """
+
+    barrier = True
+
+    def sendcmd(self):
+        """Send the gdb command.
+
+        Return True when the command has been sent to gdb, False otherwise.
+
+        """
+        name = self.varobj['name']
+        if not name or self.varobj['dynamic'] == '0':
+            return False
+        self.result = ''
+        return self.send('-var-set-update-range %s 0 %d\n', name,
+                                                len(self.varobj['children']))
+
+    def handle_result(self, line):
+        """Process gdb/mi result."""
+        if line.startswith('done'):
+            self.result = line
+
 class VarObjCmdDelete(VarObjCmd):
     """The VarObjCmdDelete class."""
 
@@ -1242,11 +2622,8 @@ class VarObjCmdDelete(VarObjCmd):
         if matchobj:
             self.result = matchobj.group('ndeleted')
             if self.result:
-                name = self.varobj['name']
                 rootvarobj = self.gdb.info.varobj
-                (varobj, varlist) = rootvarobj.leaf(name)
-                if varlist is not None:
-                    del varlist[name]
+                if rootvarobj.delete(self.varobj['name']):
                     rootvarobj.dirty = True
 
 class OobCommand(object):
@@ -1255,9 +2632,15 @@ class OobCommand(object):
     An OobCommand can either send a gdb command, or process the result of other
     OobCommands as with the Project OobCommand.
 
+    Class attributes:
+        barrier: boolean
+            when True, the OobCommand is run only after the results of all the
+            previous oob commands have been received and processed
+
     """
 
     __metaclass__ = ABCMeta
+    barrier = False
 
     def __init__(self, gdb):
         self.gdb = gdb
@@ -1291,6 +2674,9 @@ class OobGdbCommand(OobCommand, Command):
             gdb.info.info_attribute is set with list of regexp groups tuples
         gdblist: bool
             True when the result is a gdb list
+        lazy: bool
+            optional: not present in all subclasses
+            when True, the result is parsed as lazy views with mi_view()
         action: str
             optional: not present in all subclasses
             name of the gdb.info method that is called after parsing the result
@@ -1303,6 +2689,11 @@ class OobGdbCommand(OobCommand, Command):
         trigger_prefix: set
             set of the trigger_list command prefixes built from the
             trigger_list and the list of gdb commands
+        listbuffer: str
+            optional: not present in all subclasses
+            name of the list buffer that displays the result, the command
+            is not sent while this list buffer is hidden and 'trigger'
+            remains set until the list buffer is opened
 
     """
 
@@ -1348,7 +2739,7 @@ class OobGdbCommand(OobCommand, Command):
         Return True when the command was sent, False otherwise.
 
         """
-        if self.trigger:
+        if self.trigger and not self.hidden():
             if not self.gdblist and self.reqkeys:
                 setattr(self.gdb.info, self.info_attribute, {})
             else:
@@ -1358,6 +2749,11 @@ class OobGdbCommand(OobCommand, Command):
             return self.send(self.gdb_cmd)
         return False
 
+    def hidden(self):
+        """Return True when the list buffer of the command is hidden."""
+        return (hasattr(self, 'listbuffer') and
+                self.gdb.listbuffer_hidden(self.listbuffer))
+
     def parse(self, data):
         """Parse 'data' with the regexp after removing prefix.
 
@@ -1380,8 +2776,8 @@ class OobGdbCommand(OobCommand, Command):
         if self.gdblist:
             # A list of dictionaries.
             eol_strip = self.remain if hasattr(self, 'remain') else ''
-            remove = self.remove if hasattr(self, 'remove') else ''
-            parsed = eval_mi_result(data, eol_strip, remove)
+            lazy = hasattr(self, 'lazy') and self.lazy
+            parsed = eval_mi_result(data, eol_strip, lazy)
         else:
             if self.reqkeys:
                 parsed = misc.parse_keyval(self.regexp, data)
@@ -1435,20 +2831,6 @@ Args =          \
                 'trigger_list': PROJECT_CMDS,
             })
 
-Breakpoints =   \
-    type(str('Breakpoints'), (OobGdbCommand,),
-            {
-                '__doc__': """Get the breakpoints list.""",
-                'gdb_cmd': '-break-list\n',
-                'info_attribute': 'breakpoints',
-                'prefix': 'body=',
-                'remain': '}',
-                'remove': re.compile('bkpt='),
-                'gdblist': True,
-                'action': 'update_breakpoints',
-                'trigger_list': BREAKPOINT_CMDS,
-            })
-
 Directories =   \
     type(str('Directories'), (OobGdbCommand,),
             {
@@ -1508,34 +2890,91 @@ Frame=          \
                 'trigger_list': FRAME_CMDS,
             })
 
-BackTrace=          \
-    type(str('BackTrace'), (OobGdbCommand,),
+StackDepth=          \
+    type(str('StackDepth'), (OobGdbCommand,),
             {
-                '__doc__': """Get the backtrace information.""",
-                'gdb_cmd': '-stack-list-frames\n',
-                'info_attribute': 'backtrace',
-                'prefix': 'stack=',
-                'remove': re.compile('frame='),
+                '__doc__': """Get the depth of the backtrace.""",
+                'gdb_cmd': '-stack-info-depth %d\n' % BACKTRACE_DEPTH_MAX,
+                'info_attribute': 'depth',
+                'prefix': 'done,depth=',
                 'ignore': 'error,msg="No registers."',
-                'gdblist': True,
-                'trigger_list': FRAME_CMDS,
-            })
-
-Threads=          \
-    type(str('Threads'), (OobGdbCommand,),
-            {
-                '__doc__': """Get the threads information.""",
-                'gdb_cmd': '-thread-info\n',
-                'info_attribute': 'threads_list',
-                'prefix': 'threads=[',
-                'remain': ']',
-                'regexp': re_threads,
+                'regexp': re_depth,
                 'reqkeys': set(),
                 'gdblist': False,
-                'action': 'update_threads',
-                'trigger_list': THREADS_CMDS,
+                'action': 'update_depth',
+                'trigger_list': FRAME_CMDS,
+                'listbuffer': 'backtrace',
             })
 
+class BackTrace(OobGdbCommand):
+    """Get the backtrace information.
+
+    Only the loaded range of frames, the first Info.backtrace_size frames, is
+    fetched.
+
+    """
+
+    gdb_cmd = '-stack-list-frames 0 %d\n'
+    info_attribute = 'backtrace'
+    prefix = 'stack='
+    ignore = 'error,msg="No registers."'
+    gdblist = True
+    lazy = True
+    trigger_list = FRAME_CMDS
+    listbuffer = 'backtrace'
+
+    def __call__(self):
+        """Send the gdb command.
+
+        Return True when the command was sent, False otherwise.
+
+        """
+        if self.trigger and not self.hidden():
+            self.gdb.info.backtrace = []
+            self.trigger = False
+            return self.send(self.gdb_cmd, self.gdb.info.backtrace_size - 1)
+        return False
+
+class Threads(OobGdbCommand):
+    """Get the threads information.
+
+    Once gdb has sent a thread async record, the threads table is maintained
+    by Info.thread_notification() and only the threads whose state is unknown
+    are queried, unless there are more than THREADS_QUERY_MAX of them.
+
+    """
+
+    gdb_cmd = '-thread-info\n'
+    info_attribute = 'threads_list'
+    prefix = 'done,'
+    gdblist = True
+    lazy = True
+    action = 'update_threads'
+    trigger_list = THREADS_CMDS
+    listbuffer = 'threads'
+
+    def __call__(self):
+        """Send the gdb commands.
+
+        Return True when a command was sent, False otherwise.
+
+        """
+        if self.hidden():
+            return False
+        info = self.gdb.info
+        unknown = info.threads_unknown
+        if (not self.trigger or not info.thread_notifications or
+                unknown is None or len(unknown) > THREADS_QUERY_MAX):
+            return OobGdbCommand.__call__(self)
+
+        self.trigger = False
+        info.threads_unknown = set()
+        sent = False
+        for id in sorted(unknown):
+            if ThreadInfoCommand(self.gdb, id).sendcmd():
+                sent = True
+        return sent
+
 PgmFile =       \
     type(str('PgmFile'), (OobGdbCommand,),
             {
@@ -1562,29 +3001,106 @@ Pwd =           \
                 'trigger_list': PROJECT_CMDS,
             })
 
-Sources =       \
-    type(str('Sources'), (OobGdbCommand,),
-            {
-                '__doc__': """Get the list of source files.""",
-                'gdb_cmd': '-file-list-exec-source-files\n',
-                'info_attribute': 'sources',
-                'prefix': 'done,files=',
-                'gdblist': True,
-                'trigger_list': SOURCE_CMDS,
-            })
-
 VarUpdate =     \
     type(str('VarUpdate'), (OobGdbCommand,),
             {
-                '__doc__': """Update the variable and its children.""",
-                'gdb_cmd': '-var-update --all-values *\n',
+                '__doc__': """Update the variable and its children.
+
+                Only the expanded varobjs have children in gdb, the children
+                are deleted on a collapse. The values of the arrays,
+                structures and unions are not listed, they do not change. The
+                command is not sent while the variables buffer is hidden.
+
+                """,
+                'gdb_cmd': '-var-update --simple-values *\n',
                 'info_attribute': 'changelist',
                 'prefix': 'done,changelist=',
                 'gdblist': True,
                 'action': 'update_changelist',
                 'trigger_list': VARUPDATE_CMDS,
+                'listbuffer': 'variables',
             })
 
+class Breakpoints(OobGdbCommand):
+    """Get the breakpoints list.
+
+    Once gdb has sent a =breakpoint-* async record, the breakpoints table is
+    maintained by Info.breakpoint_notification() and the breakpoints list is
+    fetched only on a forced notification. The Sources oob command forces it
+    each time the sources list is fetched, so that the table is resynced and
+    the signs that could not be placed are placed with the new sources.
+
+    """
+
+    gdb_cmd = '-break-list\n'
+    info_attribute = 'breakpoints'
+    prefix = 'body='
+    remain = '}'
+    gdblist = True
+    action = 'update_breakpoints'
+    trigger_list = BREAKPOINT_CMDS
+
+    def notify(self, cmd, force=False):
+        """Notify of the cmd being processed."""
+        if force or not self.gdb.info.bp_notifications:
+            OobGdbCommand.notify(self, cmd, force)
+
+class Sources(OobGdbCommand):
+    """Get the list of source files.
+
+    The =library-loaded async records are coalesced: the list is fetched once
+    no library has been loaded during the last LIBRARY_LOADED_DELAY seconds.
+
+    Instance attributes:
+        library_time: float
+            time of the last =library-loaded async record not yet handled,
+            zero when there is none
+
+    """
+
+    gdb_cmd = '-file-list-exec-source-files\n'
+    info_attribute = 'sources'
+    prefix = 'done,files='
+    gdblist = True
+    action = 'update_sources'
+    # Triggered by Info.update_file().
+    barrier = True
+    trigger_list = SOURCE_CMDS
+
+    def __init__(self, gdb):
+        OobGdbCommand.__init__(self, gdb)
+        self.library_time = 0
+
+    def notify(self, cmd, force=False):
+        """Notify of the cmd being processed."""
+        OobGdbCommand.notify(self, cmd, force)
+        if self.trigger:
+            self.gdb.info.completion.clear()
+            self.gdb.info.symbols.clear()
+
+    def library_loaded(self):
+        """Notify of a =library-loaded async record."""
+        self.library_time = time.time()
+        self.gdb.info.completion.clear()
+        self.gdb.info.symbols.clear()
+
+    def settled(self):
+        """Return True when the loading of libraries has settled."""
+        return bool(self.library_time and
+                    time.time() - self.library_time > LIBRARY_LOADED_DELAY)
+
+    def __call__(self):
+        """Send the gdb command."""
+        if self.settled():
+            self.library_time = 0
+            self.trigger = True
+        sent = OobGdbCommand.__call__(self)
+        if sent:
+            # Resync the breakpoints table after the new sources list.
+            self.gdb.oob_list.get_oobcmd(Breakpoints).notify(self.cmd,
+                                                             force=True)
+        return sent
+
 class Project(OobCommand):
     """Save project information.
 
@@ -1594,6 +3110,8 @@ class Project(OobCommand):
 
     """
 
+    barrier = True
+
     def __init__(self, gdb):
         OobCommand.__init__(self, gdb)
         self.project_name = ''
@@ -1669,6 +3187,8 @@ class Quit(OobCommand):
 
     """
 
+    barrier = True
+
     def notify(self, cmd):
         """Ignore the notification."""
 
@@ -25,12 +25,13 @@ import atexit
 import pprint
 import itertools
 import io
-from collections import deque
 
 from . import text_type, ClewnError
 
 DOUBLEQUOTE = '"'
 QUOTED_STRING = r'"((?:\\"|[^"])+)"'
+QUOTED_CSTRING = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+QUOTED_CCHAR = r"'[^'\\]*(?:\\.[^'\\]*)*'"
 NBDEBUG = 5
 NBDEBUG_LEVEL_NAME = 'nbdebug'
 LOG_LEVELS = ('critical', 'error', 'warning', 'info', 'debug',
@@ -332,88 +333,101 @@ class StderrHandler(logging.StreamHandler):
         self.strbuf.close()
         logging.StreamHandler.close(self)
 
-def index_list(txt, sub, start, end):
-    """Return the list of indexes of 'sub' in 'txt'."""
-    l = len(txt)
-    indexes = deque()
-    while start != -1 and start < l:
-        start = txt.find(sub, start, end)
-        if start >= 0:
-            indexes.append(start)
-            start += 1
-    return indexes
-
-def match_closing(txt, matches, start=0, end=None):
-    """Match the first opening matches[0] with a closing matches[1].
-
-    >>> match_closing('bar{foo}', ('{', '}'))
-    (3, 7)
-    >>> match_closing('{foo{bar{}}}', ('{', '}'))
-    (0, 11)
-    >>> match_closing('{foo{bar', ('{', '}'))
-    Traceback (most recent call last):
-    ...
-    clewn.ClewnError: error: one of the substring is missing
-    >>> match_closing('{foo{bar}', ('{', '}'))
-    Traceback (most recent call last):
-    ...
-    clewn.ClewnError: error: '{' at 0 not matched with any '}'
+# The scan_matches() regexps keyed by their 'matches' tuple.
+_scan_regexps = {}
 
-    """
-    opensub = index_list(txt, matches[0], start, end)
-    closesub = index_list(txt, matches[1], start, end)
-    if not opensub or not closesub:
-        raise ClewnError('error: one of the substring is missing')
-
-    start = opensub.popleft()
-    c = None
-    stack = deque()
-    while closesub:
-        if c is None:
-            c = closesub.popleft()
-        o = opensub.popleft() if opensub else None
-        if o and o < c:
-            stack.append(o)
-            continue
-
-        while stack:
-            stack.pop()
-            if not closesub:
-                break
-            c = closesub.popleft()
-            if o and o < c:
-                stack.append(o)
-                break
-        else:
-            return start, c
-    else:
-        raise ClewnError("error: '%s' at %d not matched with any '%s'"
-                         % (matches[0], start, matches[1]))
+def scan_matches(txt, matches, start=0, end=None):
+    r"""Return an iterator over the matches[0] and matches[1] tokens in 'txt'.
 
-def split_matches(txt, matches, start=0):
-    """Split 'txt' into matching matches[0] with matches[1] at the same level.
+    The text is scanned once from left to right and the tokens within a
+    double quoted c-string or a single quoted character constant are
+    skipped.
 
-    >>> txt = r'threads=[{id="1",frame={level="0",args=[{name="t",value="0x7f"},{name="s",value="0x40\"[{:0>2}:{:0>2}:{:0>2}.{:0>6}]\""}],line="5"},core="3"}],current-thread-id="1"'
+    >>> list(scan_matches('max; *ptr != \';\'; s == "a;b"', (';', ';')))
+    [(';', 3), (';', 16)]
 
-    >>> split_matches(txt, ('{', '}'))
-    ['{id="1",frame={level="0",args=[{name="t",value="0x7f"},{name="s",value="0x40"[{:0>2}:{:0>2}:{:0>2}.{:0>6}]""}],line="5"},core="3"}']
+    """
+    regexp = _scan_regexps.get(matches)
+    if regexp is None:
+        regexp = re.compile(QUOTED_CSTRING + '|' + QUOTED_CCHAR + '|' +
+                            re.escape(matches[0]) + '|' +
+                            re.escape(matches[1]))
+        _scan_regexps[matches] = regexp
+    if end is None:
+        end = len(txt)
+    for matchobj in regexp.finditer(txt, start, end):
+        token = matchobj.group()
+        if token == matches[0] or token == matches[1]:
+            yield token, matchobj.start()
+
+class CompletionTrie(object):
+    """A cache of the completions of command lines in a prefix trie.
+
+    The completions of a command line are also the completions of the
+    command lines that extend its last word, filtered by this command line.
+    A truncated list of completions is only used for the same command line.
+
+    >>> trie = CompletionTrie()
+    >>> trie.insert('break fo', ['break foo', 'break foo_bar', 'break fork'])
+    >>> trie.lookup('break foo_')
+    ['break foo_bar']
+    >>> trie.lookup('break foo.c:')
+    >>> trie.insert('print ', ['print a', 'print b'], complete=False)
+    >>> trie.lookup('print ')
+    ['print a', 'print b']
+    >>> trie.lookup('print a')
+    >>> trie.clear()
+    >>> trie.lookup('break foo_')
+
+    Instance attributes:
+        root: dict
+            the root node of the trie, a node is a dictionary of its children
+            keyed by character, the value of the None key is the tuple
+            (completions list, complete)
 
-    >>> split_matches(txt, ('{', '}'), 17)
-    ['{level="0",args=[{name="t",value="0x7f"},{name="s",value="0x40"[{:0>2}:{:0>2}:{:0>2}.{:0>6}]""}],line="5"}']
+    """
 
-    >>> split_matches(txt, ('{', '}'), 74)
-    ['{:0>2}', '{:0>2}', '{:0>2}', '{:0>6}']
+    def __init__(self):
+        self.root = {}
+
+    def clear(self):
+        """Remove all the completions."""
+        self.root = {}
+
+    def insert(self, line, completions, complete=True):
+        """Add the completions of 'line'.
+
+        'complete' is False when the list of completions has been truncated.
+
+        """
+        node = self.root
+        for char in line:
+            node = node.setdefault(char, {})
+        node[None] = (completions, complete)
+
+    def lookup(self, line):
+        """Return the completions of 'line' or None when they are not known."""
+        # 'line' must extend the last word of a cached command line.
+        start = re.search(r'\w*$', line).start()
+        found = []
+        node = self.root
+        for idx in range(len(line) + 1):
+            if None in node and (idx >= start or idx == len(line)):
+                found.append((idx, node[None]))
+            if idx == len(line):
+                break
+            node = node.get(line[idx])
+            if node is None:
+                break
 
-    """
-    matchlist = []
-    while True:
-        try:
-            start, end = match_closing(txt, matches, start)
-        except ClewnError:
-            break
-        matchlist.append(txt[start:end+1])
-        start = end + 1
-    return matchlist
+        for idx, (completions, complete) in reversed(found):
+            if idx == len(line):
+                return completions
+            if complete:
+                completions = [x for x in completions if x.startswith(line)]
+                self.insert(line, completions)
+                return completions
+        return None
 
 def _test():
     """Run the doctests."""
@@ -400,12 +400,15 @@ class ClewnListBuffer(ClewnBuffer):
     Instance attributes:
         linelist: list
             the vim buffer content as a sequence of newline terminated strings
+        hidden: boolean
+            when True, the buffer is known not to be displayed in a Vim window
 
     """
 
     def __init__(self, name, nbsock):
         ClewnBuffer.__init__(self, name, nbsock)
         self.linelist = []
+        self.hidden = False
 
     def clear(self, len=-1):
         """Clear the buffer."""
@@ -423,15 +426,29 @@ class ClewnListBuffer(ClewnBuffer):
         num_lines = len(newlist)
         offsets = [offset for offset in misc.offset_gen(newlist)]
 
+        # Only the lines between the common head and the common tail of the
+        # two lists are diffed.
+        oldlist = self.linelist
+        size = min(len(oldlist), num_lines)
+        head = 0
+        while head < size and oldlist[head] == newlist[head]:
+            head += 1
+        tail = 0
+        while (tail < size - head and
+                oldlist[-1 - tail] == newlist[-1 - tail]):
+            tail += 1
+        oldlist = oldlist[head:len(oldlist) - tail]
+        changed = newlist[head:num_lines - tail]
+
         started = False
         hunk_a = hunk_b = 0
         send_function = self.send_function
         try:
             if logger.level <= logging.DEBUG:
-                for line in difflib.unified_diff(self.linelist, newlist):
+                for line in difflib.unified_diff(oldlist, changed):
                     debug(line.strip('\n'))
 
-            for line in difflib.unified_diff(self.linelist, newlist):
+            for line in difflib.unified_diff(oldlist, changed):
                 if not started:
                     if line.startswith('+++'):
                         started = True
@@ -442,6 +459,7 @@ class ClewnListBuffer(ClewnBuffer):
                         lnum = int(matchobj.group('lnum'))
                         if lnum == 0:
                             lnum = 1
+                        lnum += head
                         # @@ -l,s +l,s @@
                         # each range can omit the comma and trailing value s, in
                         # which case s defaults to 1
@@ -631,6 +649,10 @@ class Netbeans(asyncio.Protocol, object):
             queue of netbeans messages received before the debugger is setup
         got_addAnno: boolean
             True when a Vim sign is being placed
+        atomic: boolean
+            True when the next commands are sent in an atomic section
+        atomic_started: boolean
+            True when 'startAtomic' has been sent in the atomic section
 
     Class attributes:
         remove_fix: str
@@ -673,6 +695,8 @@ class Netbeans(asyncio.Protocol, object):
         self.frame_annotation = vimbuffer.FrameAnnotation(self)
         self.msg_queue = queue.Queue()
         self.got_addAnno = False
+        self.atomic = False
+        self.atomic_started = False
 
         # Create the console, the empty buffer and the list buffers.
         self.console = Console(self)
@@ -689,6 +713,11 @@ class Netbeans(asyncio.Protocol, object):
         self.debugger = debugger
         debugger.set_nbsock(self)
 
+        # No window is created for the list buffers with '--window=none'.
+        hidden = (debugger.vim.options.window == 'none')
+        for lbuf in self.list_buffers.values():
+            lbuf.hidden = hidden
+
         # Process the netbeans messages received while the debugger instance was
         # not yet known.
         while not self.msg_queue.empty():
@@ -899,7 +928,8 @@ class Netbeans(asyncio.Protocol, object):
 
         The event notifies clewn of a change in the state of the editport,
         as visible (open) or not visible (close) in a Vim window or that
-        a tabpage with/without clewn buffers has been entered.
+        a tabpage with/without clewn buffers has been entered, or that more
+        lines are requested in a list buffer (more).
 
         """
         clewnbuf = visible = None
@@ -921,6 +951,12 @@ class Netbeans(asyncio.Protocol, object):
                 clewnbuf = self.list_buffers[name]
             if visible is not None and clewnbuf:
                 clewnbuf.visible = visible
+                if name in LIST_BUFFERS:
+                    clewnbuf.hidden = not visible
+                    if visible:
+                        self.debugger.listbuffer_opened(name)
+            elif state == 'more' and name in LIST_BUFFERS:
+                self.debugger.load_more(name)
 
     def evt_keyAtPos(self, buf_id, nbstring, arg_list):
         """Process a keyAtPos netbeans event."""
@@ -980,6 +1016,7 @@ class Netbeans(asyncio.Protocol, object):
                 self.last_buf = None
             if buf.editport:
                 buf.editport.clear()
+            self._bset.buffer_killed(buf)
 
     #-----------------------------------------------------------------------
     #   Commands - Functions
@@ -1006,6 +1043,9 @@ class Netbeans(asyncio.Protocol, object):
         """Send a command to Vim."""
         if cmd == 'addAnno':
             self.got_addAnno = True
+        if self.atomic and not self.atomic_started:
+            self.atomic_started = True
+            self.send_request('%d:%s!%d%s%s\n', None, 'startAtomic', '')
         self.send_request('%d:%s!%d%s%s\n', buf, cmd, args)
 
     def send_function(self, buf, function, args=''):
@@ -1081,6 +1121,25 @@ class Netbeans(asyncio.Protocol, object):
         """Delete the breakpoint."""
         self._bset.delete_anno(bp_id)
 
+    def move_bp(self, bp_id, pathname, lnum, disabled):
+        """Move the breakpoint to pathname at lnum."""
+        self._bset.move_bp(bp_id, pathname, lnum, disabled)
+
+    def start_atomic(self):
+        """Start an atomic section.
+
+        'startAtomic' is only sent with the first command of the section.
+
+        """
+        self.atomic = True
+
+    def end_atomic(self):
+        """End the atomic section."""
+        if self.atomic_started:
+            self.send_request('%d:%s!%d%s%s\n', None, 'endAtomic', '')
+        self.atomic = False
+        self.atomic_started = False
+
     def remove_all(self):
         """Remove all annotations.
 
@@ -1098,9 +1157,9 @@ class Netbeans(asyncio.Protocol, object):
         """
         return self._bset.update_bp(bp_id, disabled)
 
-    def show_frame(self, pathname, lnum):
+    def show_frame(self, pathname, lnum, setdot=False):
         """Show the frame annotation."""
-        self._bset.show_frame(pathname, lnum)
+        self._bset.show_frame(pathname, lnum, setdot)
 
     def get_lnum_list(self, pathname):
         """Return the list of line numbers of all enabled breakpoints."""
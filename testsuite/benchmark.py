@@ -0,0 +1,354 @@
+# vi:set ts=8 sts=4 sw=4 et tw=80:
+"""
+Pyclewn benchmarks.
+
+Run all the benchmarks, or only the named ones, from the distribution root
+directory:
+
+    python -m testsuite.benchmark [name ...]
+
+The benchmarks are modules of the testsuite package, like the test cases they
+import the installed clewn package. Set PYTHONPATH to benchmark the clewn
+package of the distribution instead:
+
+    PYTHONPATH=lib python -m testsuite.benchmark [name ...]
+
+"""
+
+# Python 2-3 compatibility.
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from io import open
+
+import sys
+import os
+import re
+import time
+import tempfile
+
+from clewn import gdbmi
+
+ASYNC_CMDS_COUNT = 10
+REPEAT = 3
+
+BREAKPOINT = ('bkpt={number="%(n)d",type="breakpoint",disp="keep",'
+              'enabled="y",addr="0x000000000040052f",func="foo_%(n)d",'
+              'file="foo.c",fullname="/home/user/src/project/foo.c",'
+              'line="%(n)d",thread-groups=["i1"],times="0",'
+              'original-location="foo.c:%(n)d"}')
+FRAME = ('frame={level="%(n)d",addr="0x00000000004005b4",func="recurse",'
+         'file="recurse.c",fullname="/home/user/src/project/recurse.c",'
+         'line="12"}')
+CHILD = ('child={name="var1.public.member_%(n)d",exp="member_%(n)d",'
+         'numchild="0",value="\\"item %(n)d\\"",'
+         'type="std::string",thread-id="1"}')
+THREAD = ('{id="%(n)d",target-id="Thread 0x7ffff7fd%(n)04x (LWP %(n)d)",'
+          'frame={level="0",addr="0x00000000004005b4",func="worker",'
+          'args=[%(args)s],file="worker.c",'
+          'fullname="/home/user/src/project/worker.c",line="42"},'
+          'state="stopped",core="%(n)d"}')
+ARG = '{name="arg_%(n)d",value="{data = \\"%(n)d\\", next = 0x0}"}'
+SOURCE = ('{file="src/module_%(n)d.c",'
+          'fullname="/home/user/src/project/src/module_%(n)d.c"}')
+
+def timed(func, *args):
+    """Return the best time of REPEAT calls to 'func' and its result."""
+    best = None
+    for i in range(REPEAT):
+        start = time.time()
+        result = func(*args)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+def bench_async():
+    """Throughput of the commands queued with '--gdb=async'."""
+    from .test_support import TESTFN_OUT
+    from .test_gdb import Gdb
+
+    class AsyncThroughput(Gdb):
+        def runTest(self):
+            # The commands are run with 'exe' so that Vim does not wait for
+            # the completion of each one of them.
+            cmd = ['edit ${cwd}testsuite/foobar.c',
+                   'exe "Cfile ${cwd}testsuite/foobar"',
+                   'call Wait_eop()',
+                   'let g:bench_start = reltime()']
+            cmd.extend(['exe "Cshow version"'] * ASYNC_CMDS_COUNT)
+            cmd.extend([
+                'call Wait_eop()',
+                'let g:bench_time = reltimestr(reltime(g:bench_start))',
+                'redir! > ${test_out}',
+                'echo g:bench_time',
+                'qa!',
+                ])
+            self.cltest_redir(cmd, ())
+            with open(TESTFN_OUT, 'r') as fp:
+                return float(fp.read().strip())
+
+    test = AsyncThroughput()
+    test.setUp()
+    try:
+        elapsed = test.runTest()
+    finally:
+        test.tearDown()
+    # Wait_eop() runs one more command.
+    count = ASYNC_CMDS_COUNT + 1
+    return '%d commands in %.3f seconds: %.1f commands/s' % (
+                                            count, elapsed, count / elapsed)
+
+def eval_mi(line, remove):
+    """The gdb/mi parser replaced by gdbmi.parse_mi()."""
+    line = re.sub(remove, '', line)
+    line = re.sub(r'([a-zA-Z0-9_-]+)=', r'"\1":', line)
+    return eval(line, {}, {})
+
+def bench_mi():
+    """Parse multi-MB gdb/mi lists with eval() and with gdbmi.parse_mi()."""
+    records = (
+        ('-break-list', BREAKPOINT, 20000, 'bkpt='),
+        ('-stack-list-frames', FRAME, 50000, 'frame='),
+        ('-var-list-children', CHILD, 20000, 'child=(?={)'),
+        ('-file-list-exec-source-files', SOURCE, 50000, ''),
+    )
+    lines = []
+    for name, fmt, count, remove in records:
+        record = '[%s]' % ','.join(fmt % {'n': n} for n in range(count))
+        eval_time, expected = timed(eval_mi, record, remove)
+        parse_time, parsed = timed(gdbmi.parse_mi, record)
+        assert parsed == expected, name
+        lines.append('%s (%.1f MB): eval %.3fs, parse_mi %.3fs' %
+                        (name, len(record) / 1e6, eval_time, parse_time))
+    return '\n    ' + '\n    '.join(lines)
+
+def read_threads(parse, record):
+    """Read the fields of the threads buffer as Info.parse_threads() does."""
+    threads = []
+    for thread in parse(record)['threads']:
+        frame = thread['frame']
+        threads.append((thread['id'], thread['state'], frame['level'],
+                        frame['func'], frame['file']))
+    return threads
+
+def bench_lazy():
+    """Read the threads fields of a '-thread-info' record, parsed in full
+    with gdbmi.parse_mi() and lazily with gdbmi.mi_view()."""
+    args = ','.join(ARG % {'n': n} for n in range(20))
+    record = 'threads=[%s],current-thread-id="1"' % ','.join(
+                            THREAD % {'n': n, 'args': args} for n in range(5000))
+    parse_time, expected = timed(read_threads, gdbmi.parse_mi, record)
+    view_time, threads = timed(read_threads, gdbmi.mi_view, record)
+    assert threads == expected
+    return '-thread-info (%.1f MB): parse_mi %.3fs, mi_view %.3fs' % (
+                                    len(record) / 1e6, parse_time, view_time)
+
+def bench_threads():
+    """Update the threads table from '-thread-info' records of increasing
+    size, the time must grow linearly."""
+    lines = []
+    args = ','.join(ARG % {'n': n} for n in range(4))
+    for count in (2500, 5000, 10000):
+        record = 'threads=[%s],current-thread-id="1"' % ','.join(
+                        THREAD % {'n': n, 'args': args} for n in range(count))
+        info = gdbmi.Info(None)
+        def update():
+            info.threads_list = gdbmi.mi_view(record)
+            info.update_threads()
+            return len(info.threads)
+        update_time, threads = timed(update)
+        assert threads == count
+        lines.append('%5d threads: update_threads %.3fs (%.1f us/thread)' %
+                     (count, update_time, update_time / count * 1e6))
+    return '\n    ' + '\n    '.join(lines)
+
+def linear_fullpath(info, name):
+    """The '$cdir' lookup replaced by the gdbmi.Info sources index."""
+    for source in info.sources:
+        if source['file'] == name and os.path.exists(source['fullname']):
+            return source['fullname']
+
+def bench_fullpath():
+    """Resolve the files of 300 frames among 60000 sources."""
+    tmpdir = tempfile.mkdtemp()
+    try:
+        info = gdbmi.Info(None)
+        info.directories = ['$cdir']
+        info.sources = [{'file': 'module_%d.c' % n,
+                         'fullname': os.path.join(tmpdir, 'module_%d.c' % n)}
+                        for n in range(60000)]
+        names = ['module_%d.c' % (n * 200) for n in range(300)]
+        for name in names:
+            open(os.path.join(tmpdir, name), 'w').close()
+        linear_time, expected = timed(
+                    lambda: [linear_fullpath(info, x) for x in names])
+        index_time = timed(info.update_sources)[0]
+        lookup_time, fullpaths = timed(
+                    lambda: [info.get_fullpath(x) for x in names])
+        assert fullpaths == expected
+    finally:
+        for name in os.listdir(tmpdir):
+            os.unlink(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
+    return ('linear search %.3fs, sources index %.3fs and lookup %.4fs' %
+                                    (linear_time, index_time, lookup_time))
+
+def bench_varobj():
+    """Render the variables buffer of 20000 varobjs, then render it again
+    after the change of a single value."""
+    root = gdbmi.RootVarObj()
+    for n in range(200):
+        name = 'var%d' % n
+        varobj = gdbmi.VarObj({'name': name, 'exp': 'array_%d' % n,
+                               'type': 'struct item [100]', 'numchild': '100',
+                               'value': '[100]'})
+        root.root[name] = varobj
+        for i in range(100):
+            childname = '%s.%d' % (name, i)
+            varobj['children'][childname] = gdbmi.VarObj({
+                        'name': childname, 'exp': str(i), 'type': 'int',
+                        'numchild': '0', 'value': str(i)})
+    root.dirty = True
+    start = time.time()
+    root.collect()
+    full_time = time.time() - start
+    # Two runs: the change itself, then the removal of its '={*}' marker.
+    child = root.root['var100']['children']['var100.50']
+    def update():
+        child['value'] = '-1'
+        child.chged = True
+        root.dirty = True
+        root.collect()
+        return root.collect()
+    update_time, content = timed(update)
+    assert ' ={=}-1\n' in content and not root.dirty
+    return 'full rendering %.3fs, one varobj changed %.3fs' % (
+                                                    full_time, update_time)
+
+def bench_memory():
+    """Memory used by the 100000 children of a varobj, compared to the
+    memory used by their gdb/mi records."""
+    try:
+        import tracemalloc
+    except ImportError:
+        return 'tracemalloc is not available'
+
+    record = '[%s]' % ','.join(CHILD % {'n': n} for n in range(100000))
+    tracemalloc.start()
+    try:
+        varlist = gdbmi.parse_mi(record)
+        parsed_size = tracemalloc.get_traced_memory()[0]
+        varobj = gdbmi.VarObj({'name': 'var1', 'exp': 'public',
+                               'numchild': '100000'})
+        for child in (gdbmi.VarObj(x) for x in varlist):
+            varobj['children'][child['name']] = child
+        del varlist
+        varobj_size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return ('gdb/mi records %.1f MB, varobjs %.1f MB (%d bytes per varobj)' %
+                        (parsed_size / 1e6, varobj_size / 1e6,
+                         varobj_size // len(varobj['children'])))
+
+def split_leaf(rootvarobj, childname):
+    """The varobj lookup replaced by the gdbmi.RootVarObj index."""
+    branch = childname.split('.')
+    curlist = rootvarobj.root
+    for i in range(len(branch)):
+        name = '.'.join(branch[:i+1])
+        if i == len(branch) - 1:
+            return (curlist[name], curlist)
+        curlist = curlist[name]['children']
+
+def bench_changelist():
+    """Look up the varobjs of a 20000 entries changelist in a tree of
+    varobjs nested 30 levels deep."""
+    rootvarobj = gdbmi.RootVarObj()
+    names = []
+    for n in range(1000):
+        varlist = rootvarobj.root
+        name = 'var%d' % n
+        for level in range(30):
+            varobj = gdbmi.VarObj({'name': name, 'exp': 'member_%d' % level})
+            rootvarobj.add(varlist, varobj)
+            names.append(name)
+            varlist = varobj['children']
+            name = '%s.member_%d' % (name, level)
+    changelist = names[::len(names) // 20000]
+    split_time, expected = timed(
+                lambda: [split_leaf(rootvarobj, x) for x in changelist])
+    index_time, varobjs = timed(
+                lambda: [rootvarobj.leaf(x) for x in changelist])
+    assert all(x[0] is y[0] and x[1] is y[1]
+                                        for (x, y) in zip(varobjs, expected))
+    return 'name splitting %.3fs, index %.3fs' % (split_time, index_time)
+
+def bench_breakpoints():
+    """Render the breakpoints buffer of 20000 breakpoints, then render it
+    again after the hit count of one breakpoint has changed."""
+    info = gdbmi.Info(None)
+    record = '[%s]' % ','.join(BREAKPOINT % {'n': n} for n in range(20000))
+    for bp in gdbmi.parse_mi(record):
+        info.bp_dictionary[int(bp['number'])] = bp
+    full_time = timed(lambda: (info.bp_lines.clear(),
+                               info.collect_breakpoints()))[0]
+    def update():
+        bp = dict(info.bp_dictionary[10000])
+        bp['times'] = str(int(bp['times']) + 1)
+        info.bp_dictionary[10000] = bp
+        return info.collect_breakpoints()
+    update_time, content = timed(update)
+    assert '10000 breakpoint      y   %d ' % REPEAT in content
+    return 'full rendering %.3fs, one breakpoint changed %.3fs' % (
+                                                    full_time, update_time)
+
+def unquote_stream_record(line):
+    """The stream record decoding replaced by gdbmi.parse_stream_record()."""
+    from clewn import misc
+
+    matchobj = misc.re_quoted.match(line[1:])
+    if matchobj:
+        return misc.unquote(matchobj.group(1))
+
+def bench_stream():
+    """Decode the 200000 stream records of an 'info functions' output."""
+    lines = []
+    for n in range(200000):
+        if n % 100 == 0:
+            lines.append(r'~"\nFile src/module_%d.c:\n"' % n)
+        elif n % 10 == 0:
+            lines.append(r'~"0x%016x  symbol_%d\n"' % (n, n))
+        else:
+            lines.append(r'~"%d:\tstatic int function_%d(struct item *, '
+                         r'const char *);\n"' % (n, n))
+    unquote_time, expected = timed(
+                lambda: [unquote_stream_record(x) for x in lines])
+    parse_time, texts = timed(
+                lambda: [gdbmi.parse_stream_record(x) for x in lines])
+    assert texts == expected
+    return 'unquote %.3fs, parse_stream_record %.3fs' % (unquote_time,
+                                                          parse_time)
+
+BENCHMARKS = (
+    ('async', bench_async),
+    ('mi', bench_mi),
+    ('lazy', bench_lazy),
+    ('threads', bench_threads),
+    ('fullpath', bench_fullpath),
+    ('varobj', bench_varobj),
+    ('memory', bench_memory),
+    ('changelist', bench_changelist),
+    ('breakpoints', bench_breakpoints),
+    ('stream', bench_stream),
+)
+
+def main(names):
+    for name, benchmark in BENCHMARKS:
+        if names and name not in names:
+            continue
+        print('%s: %s' % (name, benchmark()))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,13 @@
+/* A recursive function for the tests of deep backtraces. */
+
+int recurse(int depth)
+{
+    if (depth == 0)
+        return 0;
+    return recurse(depth - 1) + 1;
+}
+
+int main(int argc, char *argv[])
+{
+    return recurse(150) == 150 ? 0 : 1;
+}
@@ -0,0 +1,18 @@
+/* The 'relocate' and 'relocate_shift' programs are built from this file for
+ * the test of a breakpoint relocated by gdb when the program is reloaded:
+ * with SHIFT defined, the first line of code of 'relocate' is two lines
+ * before. */
+
+int relocate(int count)
+{
+#ifdef SHIFT
+    static int calls;
+    calls++;
+#endif
+    return count + 1;
+}
+
+int main(int argc, char *argv[])
+{
+    return relocate(argc) == argc + 1 ? 0 : 1;
+}
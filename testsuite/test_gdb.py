@@ -1629,6 +1629,110 @@ class Gdb(ClewnTestCase):
             )
         self.cltest_redir(cmd, expected)
 
+    def test_071(self):
+        """Create the varobjs of several expressions with one Cdbgvar"""
+        gdbmi.VarCreateCommand.varnum = 1
+        gdbmi.VarCreateCommand.released = []
+        cmd = [
+            'Cfile testsuite/foobar',
+            'Cbreak foo',
+            'Crun',
+            "Cdbgvar max; dummy; *ptr != ';'",
+            'Cdbgvar sleep',
+            'edit (clewn)_console | $$ | ?dummy:?w!  ${test_out}',
+            'buffer (clewn)_variables | 1,$$w! >> ${test_out}',
+            'qa!',
+            ]
+        expected = (
+            'dummy: -var-create: unable to create variable object',
+            " *  var1: (int) max ={*}-1",
+            " *  var3: (int) *ptr != ';' ={*}1",
+            " *  var2: (int) sleep ={*}100",
+            )
+        self.cltest_redir(cmd, expected)
+
+    def test_072(self):
+        """Load the next frames of a deep backtrace on a cursor move"""
+        cmd = [
+            'Cfile testsuite/recurse',
+            'Cbreak recurse if depth == 0',
+            'Crun',
+            'call Goto_buffer("(clewn)_backtrace")',
+            '$$w!  ${test_out}',
+            'normal G',
+            'doautocmd CursorMoved',
+            'call Wait_eop()',
+            '$$w! >> ${test_out}',
+            'qa!',
+            ]
+        expected = (
+            '  ... 52 more frames',
+            '  #151 in main at recurse.c:12 <${cwd}testsuite/recurse.c>',
+            )
+        self.cltest_redir(cmd, expected)
+
+    def test_073(self):
+        """Commands queued while gdb is busy are run in sequence"""
+        cmd = [
+            'Cfile testsuite/foobar',
+            'exe "Cbreak foo" | exe "Cbreak bar" | exe "Crun"',
+            'call Wait_eop()',
+            'edit (clewn)_breakpoints | %w!  ${test_out}',
+            'edit ${test_out}',
+            r'%s/\(.*\) <.*>$$/\1',
+            'write',
+            'qa!',
+            ]
+        expected = (
+            'Num  Type            Enb Hit   Disp   What',
+            '1    breakpoint      y   1     keep   in foo at foo.c:30',
+            '2    breakpoint      y   0     keep   in bar at bar.c:5',
+            )
+        self.cltest_redir(cmd, expected)
+
+    def test_074(self):
+        """The sign of a breakpoint relocated by gdb is moved in place"""
+        cmd = [
+            'Cfile testsuite/relocate',
+            'Cbreak relocate',
+            'redir! > ${test_out}',
+            'sign place',
+            'Cfile testsuite/relocate_shift',
+            'sign place',
+            'qa!',
+            ]
+        expected = (
+            'Signs for ${cwd}testsuite/relocate.c:',
+            'line=12  id=2  name=1',
+            '',
+            '--- Signs ---',
+            'Signs for ${cwd}testsuite/relocate.c:',
+            'line=10  id=2  name=1',
+            )
+        self.cltest_redir(cmd, expected)
+
+    @skipUnless(gdb_v >= [7], 'gdb version less recent than 7.0')
+    def test_075(self):
+        """Fetch the children of a large array by chunks"""
+        gdbmi.VarCreateCommand.varnum = 1
+        cmd = [
+            'Cfile testsuite/foobar',
+            'Cbreak foo',
+            'Crun',
+            'Cdbgvar *ptr@150',
+            'Cfoldvar 1',
+            'edit (clewn)_variables | $$w!  ${test_out}',
+            'Cfoldvar 102',
+            'redir >> ${test_out}',
+            'echo line("$$")',
+            'qa!',
+            ]
+        expected = (
+            '  ... 50 more children',
+            '151',
+            )
+        self.cltest_redir(cmd, expected)
+
 class PyclewnCommand(TestCase):
     """Test the ':Pyclewn' command."""
 